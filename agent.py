@@ -1,63 +1,22 @@
 import streamlit as st
-from groq import Groq
-import PyPDF2
-from docx import Document
-import re
-import xml.etree.ElementTree as ET
+from report_parser import read_bytes, preprocess_text
+from chunking import estimate_tokens
+from lab_values import LabTable
+from summarizer import build_reduce_prompt
+from response_cache import cache_from_settings
+from streaming import render_stream
+from llm_client import LLMProvider, options_from_settings
 
-# Load Groq API key from Streamlit secrets
-client = Groq(api_key=st.secrets["GROQ_API_KEY"])
+@st.cache_resource
+def get_llm_provider():
+    """Process-wide Groq provider, so every session shares its connection pool and rate limits"""
+    # Load Groq API key from Streamlit secrets
+    return LLMProvider.groq(st.secrets["GROQ_API_KEY"], **options_from_settings(st.secrets.get("llm", {})))
 
-def read_file(file_path):
-    """Read medical report from different file formats"""
-    if file_path.endswith('.pdf'):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ''.join([page.extract_text() for page in reader.pages])
-            return text
-        
-    elif file_path.endswith('.docx'):
-        doc = Document(file_path)
-        return '\n'.join([para.text for para in doc.paragraphs])
-    
-    elif file_path.endswith('.txt'):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    
-    elif file_path.endswith('.xml'):
-        try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            return xml_to_text(root)
-        except ET.ParseError as e:
-            raise ValueError(f"Invalid XML file: {str(e)}")
-    
-    else:
-        raise ValueError("Unsupported file format. Use PDF, DOCX, TXT, or XML")
-
-def xml_to_text(element):
-    """Convert XML elements to readable text"""
-    text_parts = []
-    if element.tag.endswith('ClinicalDocument'):
-        for section in element.findall('.//section'):
-            title = section.find('title')
-            text = section.find('text')
-            if title is not None:
-                text_parts.append(title.text.strip())
-            if text is not None:
-                text_parts.append(text.text.strip())
-    else:
-        for child in element:
-            if child.text and child.text.strip():
-                text_parts.append(child.text.strip())
-            text_parts.extend(xml_to_text(child))
-    return '\n'.join(filter(None, text_parts))
-
-def preprocess_text(text):
-    """Clean and preprocess medical report text"""
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'Patient ID:\s*\d+', '[REDACTED]', text)
-    return text.strip()
+@st.cache_resource
+def get_response_cache():
+    """Process-wide cache of model responses"""
+    return cache_from_settings(st.secrets.get("response_cache", {}))
 
 def analyze_report(report_text):
     """Analyze medical report using Groq API"""
@@ -98,39 +57,75 @@ def analyze_report(report_text):
     Your responses should be informative, accurate, and always prioritize the user's health and safety.
     """
 
+    response_cache = get_response_cache()
+    bypass_cache = st.secrets.get("response_cache", {}).get("BYPASS", False)
+
+    def complete(prompt, max_tokens):
+        request = dict(
+            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.5,
+            max_completion_tokens=max_tokens,
+            top_p=0.9,
+        )
+        return response_cache.get_or_call(
+            request,
+            lambda: get_llm_provider().complete_sync(**request),
+            bypass=bypass_cache,
+        )
+
+    chunk_settings = st.secrets.get("chunking", {})
+    chunk_tokens = chunk_settings.get("CHUNK_TOKENS", 3000)
+    # Flag out-of-range lab values locally so they reach the model even after condensing
+    findings = LabTable.from_text(report_text).findings()
     try:
-        completion = client.chat.completions.create(
+        if estimate_tokens(report_text) > chunk_tokens:
+            # Summarize the report's sections concurrently, then stream the merge
+            with st.spinner("Summarizing long report in sections..."):
+                report_text = build_reduce_prompt(
+                    report_text,
+                    complete,
+                    chunk_tokens=chunk_tokens,
+                    max_in_flight=chunk_settings.get("MAX_IN_FLIGHT", 4),
+                    tokens_per_minute=chunk_settings.get("TOKENS_PER_MINUTE"),
+                )
+
+        request = dict(
             model="meta-llama/llama-4-scout-17b-16e-instruct",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": report_text}
+                {"role": "user", "content": f"{report_text}\n\n{findings}" if findings else report_text}
             ],
             temperature=0.5,
             max_completion_tokens=2048,
             top_p=0.9,
-            stream=True,
         )
 
         st.markdown("### Medical Report Analysis")
-        analysis_output = ""
-        for chunk in completion:
-            content = chunk.choices[0].delta.content or ""
-            analysis_output += content
-        st.markdown(analysis_output)
+        # Every rerun re-analyzes the loaded report, so reuse the last answer when we can
+        analysis_output = None if bypass_cache else response_cache.get(request)
+        placeholder = st.empty()
+        if analysis_output is None:
+            interval_ms = st.secrets.get("streaming", {}).get("UPDATE_INTERVAL_MS", 100)
+            analysis_output = render_stream(get_llm_provider().stream_sync(**request), placeholder, interval_ms)
+            response_cache.put(request, analysis_output)
+        else:
+            placeholder.markdown(analysis_output)
             
     except Exception as e:
         st.error(f"Error analyzing report: {e}")
 
 def main():
     st.title("Medical Report Analyzer")
-    uploaded_file = st.file_uploader("Upload a medical report", type=["pdf", "docx", "txt", "xml"])
+    uploaded_file = st.file_uploader("Upload a medical report", type=["pdf", "docx", "txt", "xml", "png", "jpg", "jpeg"])
     
     if uploaded_file is not None:
         try:
-            # Save uploaded file temporarily
-            with open(uploaded_file.name, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            raw_text = read_file(uploaded_file.name)
+            file_extension = uploaded_file.name.split('.')[-1].lower()
+            raw_text = read_bytes(uploaded_file.getbuffer(), file_extension)
             cleaned_text = preprocess_text(raw_text)
             st.subheader("Sample of Extracted Text")
             st.write(cleaned_text[:200] + "...")
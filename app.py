@@ -1,293 +1,312 @@
-import streamlit as st
-from openai import AzureOpenAI
-import os
+import json
+import time
 import uuid
-import io
-from PIL import Image
-import PyPDF2
-from docx import Document
-import re
-import xml.etree.ElementTree as ET
-import base64
-
-# Initialize Azure OpenAI client with Streamlit secrets
-client = AzureOpenAI(
-    azure_endpoint=st.secrets["azure_openai"]["ENDPOINT_URL"],
-    api_key=st.secrets["azure_openai"]["AZURE_OPENAI_API_KEY"],
-    api_version=st.secrets["azure_openai"]["API_VERSION"],
-)
+from collections import namedtuple
+
+import streamlit as st
+from document_store import DocumentStore
+from report_cache import ExtractionCache, content_key
+from report_parser import read_bytes, preprocess_text
+from analysis import chat_request, image_request, report_prompt, report_request
+from chunking import estimate_tokens
+from retrieval import ReportIndex
+from lab_values import LabTable
+from conversation import Conversation
+from response_cache import cache_from_settings
+from streaming import render_stream
+from llm_client import LLMProvider, options_from_settings, prompt_tokens
+from image_pipeline import encode_image, payload_key, policy_from_settings
+from telemetry import Telemetry
+from jobs import DONE, FINISHED, JobQueue
+
+@st.cache_resource
+def get_llm_provider():
+    """Process-wide Azure OpenAI provider, so every session shares its connection pool and rate limits"""
+    return LLMProvider.azure(
+        st.secrets["azure_openai"]["ENDPOINT_URL"],
+        st.secrets["azure_openai"]["AZURE_OPENAI_API_KEY"],
+        st.secrets["azure_openai"]["API_VERSION"],
+        **options_from_settings(st.secrets.get("llm", {})),
+    )
+
+@st.cache_resource
+def get_extraction_cache():
+    """On-disk tier of extracted report text; the document store is the in-memory tier"""
+    return ExtractionCache(max_entries=0, cache_dir=st.secrets.get("cache", {}).get("DIR"))
+
+@st.cache_resource
+def get_document_store():
+    """Process-wide store of reports and encoded images, shared by every session"""
+    return DocumentStore(max_bytes=st.secrets.get("cache", {}).get("MAX_MB", 512) * 2 ** 20)
+
+# Everything derived from one uploaded report, stored once per content hash
+ReportDocument = namedtuple('ReportDocument', 'text index lab_table')
+
+@st.cache_resource
+def get_response_cache():
+    """Process-wide cache of model responses"""
+    return cache_from_settings(st.secrets.get("response_cache", {}))
+
+@st.cache_resource
+def get_telemetry():
+    """Process-wide span collector, serving Prometheus metrics if a port is configured"""
+    settings = st.secrets.get("telemetry", {})
+    telemetry = Telemetry(window=settings.get("WINDOW", 1000), log_path=settings.get("LOG_PATH"))
+    if settings.get("METRICS_PORT"):
+        telemetry.serve(settings["METRICS_PORT"], settings.get("METRICS_HOST", "127.0.0.1"))
+    return telemetry
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide background executor for analyses, with a persistent job table"""
+    settings = st.secrets.get("jobs", {})
+    return JobQueue(
+        settings.get("PATH", "jobs.sqlite3"),
+        max_workers=settings.get("MAX_WORKERS", 4),
+        keep_seconds=settings.get("KEEP_SECONDS", 86400),
+        owner=settings.get("INSTANCE"),
+    )
+
+# The shared resources and settings an analysis uses. st.secrets and
+# cache_resource belong to the script thread, so they are resolved there
+# and passed to background jobs.
+Services = namedtuple('Services', 'provider response_cache telemetry secrets')
+
+def get_services():
+    """Resolve the provider, caches, telemetry and secrets on the script thread"""
+    return Services(get_llm_provider(), get_response_cache(), get_telemetry(), st.secrets.to_dict())
+
+def create_completion(placeholder=None, stage="llm", services=None, **request):
+    """Run a chat completion through the response cache and return the message text
+
+    With a placeholder the response is streamed into it as it is generated.
+    The call is recorded as a telemetry span named stage.
+    """
+    services = services or get_services()
+    response_cache = services.response_cache
+    bypass = services.secrets.get("response_cache", {}).get("BYPASS", False)
+    with services.telemetry.span(stage, tokens_in=prompt_tokens(request), streamed=placeholder is not None) as span:
+        text = None if bypass else response_cache.get(request)
+        if not bypass:
+            span.set(cache_hit=text is not None)
+        if text is None:
+            stats = {}
+            try:
+                if placeholder is None:
+                    text = services.provider.complete_sync(stats=stats, **request)
+                else:
+                    interval_ms = services.secrets.get("streaming", {}).get("UPDATE_INTERVAL_MS", 100)
+                    deltas = span.watch(services.provider.stream_sync(stats=stats, **request))
+                    text = render_stream(deltas, placeholder, interval_ms)
+            finally:
+                span.set(**stats)
+            response_cache.put(request, text)
+        elif placeholder is not None:
+            placeholder.markdown(text)
+        span.set(tokens_out=estimate_tokens(text))
+    return text
 
 # Streamlit page configuration
 st.set_page_config(page_title="HealthInsight", page_icon="🏥", layout="wide")
 
 # Session state initialization
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'report_text' not in st.session_state:
-    st.session_state.report_text = None
+chat_settings = st.secrets.get("chat", {})
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = Conversation(
+        window_tokens=chat_settings.get("WINDOW_TOKENS", 2000),
+        window_turns=chat_settings.get("WINDOW_TURNS"),
+        max_messages=chat_settings.get("MAX_MESSAGES", 500),
+        summary_tokens=chat_settings.get("SUMMARY_TOKENS", 300),
+    )
+if 'chat_visible' not in st.session_state:
+    # Only the most recent messages are drawn on each rerun; "load older" extends this
+    st.session_state.chat_visible = chat_settings.get("PAGE_SIZE", 20)
+# Sessions hold document store handles, not their own copies of reports and images
+if 'report' not in st.session_state:
+    st.session_state.report = None
 if 'uploaded_file_name' not in st.session_state:
     st.session_state.uploaded_file_name = None
-if 'uploaded_image' not in st.session_state:
-    st.session_state.uploaded_image = None
-
-def read_file(file_path):
-    """Read medical report from different file formats"""
-    if file_path.endswith('.pdf'):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ''.join([page.extract_text() for page in reader.pages])
-            return text
-        
-    elif file_path.endswith('.docx'):
-        doc = Document(file_path)
-        return '\n'.join([para.text for para in doc.paragraphs])
-    
-    elif file_path.endswith('.txt'):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    
-    elif file_path.endswith('.xml'):
-        try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            return xml_to_text(root)
-        except ET.ParseError as e:
-            raise ValueError(f"Invalid XML file: {str(e)}")
-    
-    else:
-        raise ValueError("Unsupported file format. Use PDF, DOCX, TXT, or XML")
-
-def xml_to_text(element):
-    """Convert XML elements to readable text"""
-    text_parts = []
-    
-    if element.tag.endswith('ClinicalDocument'):
-        for section in element.findall('.//section'):
-            title = section.find('title')
-            text = section.find('text')
-            if title is not None:
-                text_parts.append(title.text.strip())
-            if text is not None:
-                text_parts.append(text.text.strip())
-    else:
-        for child in element:
-            if child.text and child.text.strip():
-                text_parts.append(child.text.strip())
-            text_parts.extend(xml_to_text(child))
-    
-    return '\n'.join(filter(None, text_parts))
-
-def preprocess_text(text):
-    """Clean and preprocess medical report text"""
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'Patient ID:\s*\d+', '[REDACTED]', text)
-    return text.strip()
-
-def analyze_report(report_text):
-    """Analyze medical report using Azure OpenAI"""
-    system_prompt = """
-You are a doctor. Your role is to help users understand their medical reports by answering their questions based on the provided report text.
-Guidelines:
-
-Tone: Maintain a supportive and empathetic tone, acknowledging that medical reports can be concerning.
-
-Analysis: Analyze the report text to identify key information relevant to the user's question.  
-If the question is about or indicates:  
-Potential illnesses: List possible conditions mentioned or suggested by the report.  
-Critical values: Highlight any abnormal results and explain their significance.  
-Medications: Suggest recommended medications, including generic names, based on the report's findings.  
-Home Remedies: Provide steps for home remedies where applicable and safe, emphasizing they are supplementary and not a substitute for professional care.  
-Follow-up Tests: Recommend necessary follow-up tests or diagnostics based on the condition.  
-Severe Conditions: If the condition appears serious or life-threatening, suggest urgent medical attention, additional specialist consultations, and any critical tests or interventions that might be needed.
-
-For general questions, provide a summary of the report's main findings.
-
-Clarity: Use clear, non-technical language. Define medical terms when necessary.
-
-Urgent Concerns: If the report indicates a serious condition (e.g., heart attack, cancer, severe infection), urge the user to seek immediate medical attention and suggest emergency steps if applicable.
-
-Limitations:  
-If the report text is unclear or incomplete, inform the user that the analysis might be limited and suggest they provide a clearer version or consult their doctor.  
-If you cannot answer the question based on the report, say: 'I'm sorry, but I cannot provide an answer to that question based on the information in the report. Please consult your doctor for further assistance.'
-
-Privacy: Do not discuss or emphasize any personal identifiers that may be present in the report.
-
-Your responses should be informative, accurate, and always prioritize the user's health.
-"""
-
-    try:
-        completion = client.chat.completions.create(
-            model=st.secrets["azure_openai"]["DEPLOYMENT_NAME"],
-            messages=[
-                {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
-                {"role": "user", "content": [{"type": "text", "text": "Please analyze this medical report and provide a comprehensive summary: " + report_text}]}
-            ],
-            max_tokens=800,
-            temperature=0.7,
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0,
-            stream=False,
+if 'image' not in st.session_state:
+    # Handle to the encoded image_url content parts, built once per image by encode_image
+    st.session_state.image = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'pending_jobs' not in st.session_state:
+    # Background analyses this session is waiting for; see show_jobs
+    st.session_state.pending_jobs = []
+
+def hold(name, key, build):
+    """Point session_state[name] at the store entry for key, releasing the entry it held before
+
+    Loading a new entry is recorded as a "<name>_load" span.
+    """
+    handle = st.session_state[name]
+    if handle is None or handle.key != key:
+        store = get_document_store()
+        with get_telemetry().span(f"{name}_load", cache_hit=key in store):
+            st.session_state[name] = store.acquire(key, build)
+        if handle is not None:
+            handle.release()
+    return st.session_state[name].value
+
+def release(name):
+    """Drop the session's handle in session_state[name]"""
+    if st.session_state[name] is not None:
+        st.session_state[name].release()
+        st.session_state[name] = None
+
+# Shown in the chat when an analysis raises, by kind
+ANALYSIS_ERRORS = {
+    "report": "Error analyzing report: {error}",
+    "image": "Error analyzing image: {error}. Ensure your gpt-4o deployment supports vision.",
+}
+
+def analyze_report(report_text, placeholder=None, lab_table=None, services=None):
+    """Analyze medical report using Azure OpenAI, streaming into placeholder if given
+
+    Out-of-range values from lab_table are listed in the prompt as well.
+    Errors are raised; see ANALYSIS_ERRORS.
+    """
+    services = services or get_services()
+    model = services.secrets["azure_openai"]["DEPLOYMENT_NAME"]
+
+    def complete(prompt, max_tokens):
+        return create_completion(stage="analyze_report.map", services=services,
+                                 **report_request(model, prompt, max_tokens))
+
+    chunk_settings = services.secrets.get("chunking", {})
+    with services.telemetry.span("analyze_report", tokens_in=estimate_tokens(report_text)):
+        # Reports too long for one prompt are summarized in sections first, then the merge streams
+        prompt = report_prompt(
+            report_text,
+            complete,
+            chunk_tokens=chunk_settings.get("CHUNK_TOKENS", 3000),
+            findings=lab_table.findings() if lab_table is not None else None,
+            max_in_flight=chunk_settings.get("MAX_IN_FLIGHT", 4),
+            tokens_per_minute=chunk_settings.get("TOKENS_PER_MINUTE"),
         )
-        return completion.choices[0].message.content
-    except Exception as e:
-        return f"Error analyzing report: {e}"
-
-def process_image(image):
-    """Process and analyze medical image using Azure OpenAI with vision"""
-    # Convert image to base64
-    buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
-    img_str = base64.b64encode(buffered.getvalue()).decode('ascii')
-
-    # System prompt for image analysis
-    system_prompt = """
-You are a doctor specialized in analyzing medical images (e.g., X-rays, MRIs, CT scans, ultrasounds). Your role is to provide expert insights based on the visual data from the uploaded medical images.
-Guidelines:
-
-Tone: Maintain a professional, supportive, and empathetic tone, acknowledging that medical imaging results can be concerning.
-
-Analysis: Analyze the provided medical image to identify key visual findings relevant to the user's query or the image's context.  
-If the image suggests:  
-Potential conditions: Identify possible abnormalities or diseases (e.g., fractures, tumors, infections) based on visible patterns or structures.  
-Critical findings: Highlight any urgent or abnormal features (e.g., signs of bleeding, organ enlargement) and explain their potential significance.  
-Medications: Suggest recommended medications (including generic names) if a condition is identifiable and treatment is implied, noting these are preliminary suggestions.  
-Home Remedies: Provide steps for home remedies where applicable and safe (e.g., rest for minor injuries), emphasizing they are supplementary and not a substitute for professional care.  
-Follow-up Tests: Recommend additional imaging or diagnostic tests (e.g., MRI for unclear X-ray findings) to confirm or expand on the analysis.  
-Severe Conditions: If the image indicates a serious or life-threatening condition (e.g., massive stroke, advanced cancer), urge the user to seek immediate medical attention, suggest specialist referrals, and recommend critical tests or interventions.
-
-For general queries, provide a summary of observed findings and their potential implications.
-
-Clarity: Use clear, non-technical language. Define medical imaging terms (e.g., "opacity" or "lesion") when necessary.
-
-Urgent Concerns: If the image shows signs of a serious condition (e.g., acute hemorrhage, large mass), urge the user to seek immediate medical attention and suggest emergency steps if applicable.
-
-Limitations:  
-If the image quality is poor or incomplete, inform the user that the analysis may be limited and suggest they provide a higher-quality image or consult a radiologist.  
-If you cannot identify a condition or answer the question based on the image, say: 'I'm sorry, but I cannot provide a definitive analysis or answer based on this image. Please consult a radiologist or doctor for further evaluation.'  
-If you are unsure about any findings (e.g., rare conditions, treatment options), state that clearly and suggest the user verify with a medical professional.
-
-Privacy: Do not discuss or emphasize any personal identifiers that may be present in the image or associated data.
-
-Your responses should be informative, accurate, and always prioritize the user's health and safety. Provide your analysis based solely on the visual content of the medical image.
-"""
-
-    try:
-        completion = client.chat.completions.create(
-            model=st.secrets["azure_openai"]["DEPLOYMENT_NAME"],
-            messages=[
-                {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Please analyze this medical image:"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_str}",
-                                "detail": "high"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=800,
-            temperature=0.7,
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0,
-            stream=False,
+        return create_completion(placeholder, "analyze_report.llm", services, **report_request(model, prompt))
+
+def process_image(image_parts, placeholder=None, services=None):
+    """Analyze an encoded medical image (see encode_image) using Azure OpenAI with vision, streaming into placeholder if given
+
+    Errors are raised; see ANALYSIS_ERRORS.
+    """
+    services = services or get_services()
+    with services.telemetry.span("process_image", parts=len(image_parts)):
+        return create_completion(
+            placeholder,
+            "process_image.llm",
+            services,
+            **image_request(services.secrets["azure_openai"]["DEPLOYMENT_NAME"], image_parts),
         )
-        return completion.choices[0].message.content
-    except Exception as e:
-        return f"Error analyzing image: {e}. Ensure your gpt-4o deployment supports vision."
 
-def chat_with_context(message, report_text=None, image=None):
-    """Generate a response based on the message and any medical context"""
-    system_prompt = """
-You are a doctor. Your role is to help users understand their medical reports by answering their questions based on the provided report text or image analysis.
-Guidelines:
+def chat_with_context(message, report_text=None, image=None, report_index=None, placeholder=None, lab_table=None,
+                      conversation=None):
+    """Generate a response based on the message and any medical context
+
+    image is a list of encoded image_url parts from encode_image. With a
+    report_index only the passages relevant to message are sent,
+    instead of the full report_text. Questions about values in lab_table
+    send just those rows, and "is my X high?" is answered without the model.
+    The recent window of conversation (and a summary of older turns) is sent
+    before the question. With a placeholder the response is streamed into it.
+    """
+    with get_telemetry().span("chat_with_context") as span:
+        lab_rows = lab_table.find(message) if lab_table is not None else ()
+        if len(lab_rows) and st.secrets.get("labs", {}).get("ANSWER_LOCALLY", True):
+            answer = lab_table.answer(message)
+            if answer is not None:
+                span.set(answered_locally=True)
+                if placeholder is not None:
+                    placeholder.markdown(answer)
+                return answer
+
+        report_context = report_text
+        if len(lab_rows):
+            report_context = lab_table.context(lab_rows)
+        elif report_index is not None:
+            with get_telemetry().span("retrieval"):
+                report_context = report_index.context(message, st.secrets.get("retrieval", {}).get("TOP_K", 4))
+
+        model = st.secrets["azure_openai"]["DEPLOYMENT_NAME"]
+
+        def complete(prompt, max_tokens):
+            return create_completion(stage="chat_with_context.summary", **report_request(model, prompt, max_tokens))
 
-Tone: Maintain a supportive and empathetic tone, acknowledging that medical reports can be concerning.
-
-Analysis: Analyze the report text or image-derived data to identify key information relevant to the user's question.  
-If the question is about or indicates:  
-Potential illnesses: List possible conditions mentioned or suggested by the report or image.  
-Critical values: Highlight any abnormal results and explain their significance.  
-Medications: Suggest recommended medications, including generic names, based on the findings.  
-Home Remedies: Provide steps for home remedies where applicable and safe, emphasizing they are supplementary and not a substitute for professional care.  
-Follow-up Tests: Recommend necessary follow-up tests or diagnostics based on the condition.  
-Severe Conditions: If the condition appears serious or life-threatening, suggest urgent medical attention, additional specialist consultations, and any critical tests or interventions that might be needed.
-
-For general questions, provide a summary of the report's or image's main findings.
-
-Clarity: Use clear, non-technical language. Define medical terms when necessary.
-
-Urgent Concerns: If the report or image indicates a serious condition (e.g., heart attack, cancer, severe infection), urge the user to seek immediate medical attention and suggest emergency steps if applicable.
-
-Limitations:  
-If the report text or image data is unclear or incomplete, inform the user that the analysis might be limited and suggest they provide a clearer version or consult their doctor.  
-If you cannot answer the question based on the report or image, say: 'I'm sorry, but I cannot provide an answer to that question based on the information in the report or image. Please consult your doctor for further assistance.'
-
-Privacy: Do not discuss or emphasize any personal identifiers that may be present in the report or image.
-
-Your responses should be informative, accurate, and always prioritize the user's health.
-"""
-    
-    messages = [
-        {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
-        {"role": "user", "content": [{"type": "text", "text": f"User query: {message}"}]}
-    ]
-    
-    if report_text:
-        messages.append({"role": "user", "content": [{"type": "text", "text": f"Medical report content: {report_text}"}]})
-    if image:
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode('ascii')
-        messages.append({
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "Please consider this medical image:"},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_str}",
-                        "detail": "high"
-                    }
-                }
-            ]
-        })
-    
-    try:
-        completion = client.chat.completions.create(
-            model=st.secrets["azure_openai"]["DEPLOYMENT_NAME"],
-            messages=messages,
-            max_tokens=800,
-            temperature=0.7,
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0,
-            stream=False,
+        try:
+            history = conversation.model_messages(complete) if conversation is not None else ()
+            return create_completion(
+                placeholder,
+                "chat_with_context.llm",
+                **chat_request(model, message, report_context, image, history=history),
+            )
+        except Exception as e:
+            span.fail(e)
+            return f"Error generating response: {e}"
+
+def load_report(uploaded_file, file_extension, report_key):
+    """Extract, index and tabulate an uploaded report for the document store"""
+    telemetry = get_telemetry()
+    text = get_extraction_cache().get_or_create(report_key, lambda: extract_report_text(uploaded_file, file_extension))
+    chunk_tokens = st.secrets.get("retrieval", {}).get("CHUNK_TOKENS", 300)
+    with telemetry.span("index", tokens_in=estimate_tokens(text)):
+        index = ReportIndex.from_text(text, chunk_tokens)
+    with telemetry.span("labs", tokens_in=estimate_tokens(text)) as span:
+        lab_table = LabTable.from_text(text)
+        span.set(rows=len(lab_table))
+    return ReportDocument(text, index, lab_table)
+
+def load_image(image_bytes, image_policy):
+    """Encode an uploaded image for the document store"""
+    with get_telemetry().span("image_encode", bytes_in=len(image_bytes)) as span:
+        image_parts = encode_image(image_bytes, image_policy)
+        span.set(bytes_out=sum(len(part["image_url"]["url"]) for part in image_parts))
+    return image_parts
+
+def extract_report_text(uploaded_file, file_extension):
+    """Parse and preprocess an uploaded report straight from its in-memory buffer"""
+    pdf_settings = st.secrets.get("pdf", {})
+    buffer = uploaded_file.getbuffer()
+    telemetry = get_telemetry()
+    with telemetry.span("parse", format=file_extension, bytes_in=buffer.nbytes) as span:
+        raw_text = read_bytes(
+            buffer,
+            file_extension,
+            workers=pdf_settings.get("WORKERS"),
+            timeout=pdf_settings.get("TIMEOUT_SECONDS"),
         )
-        return completion.choices[0].message.content
-    except Exception as e:
-        return f"Error generating response: {e}"
-
-def save_uploaded_file(uploaded_file):
-    """Save an uploaded file temporarily and return the path"""
-    file_extension = uploaded_file.name.split('.')[-1].lower()
-    temp_file_path = f"temp_{uuid.uuid4()}.{file_extension}"
-    
-    with open(temp_file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    return temp_file_path
+        span.set(bytes_out=len(raw_text))
+    with telemetry.span("preprocess", bytes_in=len(raw_text)) as span:
+        text = preprocess_text(raw_text)
+        span.set(bytes_out=len(text))
+    if not text:
+        raise ValueError("No readable text found in this report. Scanned reports need the tesseract OCR engine.")
+    return text
 
 def main():
     st.title("🏥 HealthInsight")
     st.markdown("Chat with or without medical reports and images. Get insights about your health information.")
     
+    # The sidebar renders in place regardless of call order, so draw the chat
+    # first; analyses started from the sidebar then stream in below the history
+    st.header("💬 Chat")
+    
+    conversation = st.session_state.conversation
+    page_size = chat_settings.get("PAGE_SIZE", 20)
+    hidden = len(conversation) - st.session_state.chat_visible
+    if hidden > 0 and st.button(f"Load older messages ({hidden} hidden)"):
+        st.session_state.chat_visible += page_size
+    elif hidden <= 0 and conversation.dropped:
+        st.caption(f"{conversation.dropped} earlier messages were summarized and are no longer shown.")
+    
+    for message in conversation.recent(st.session_state.chat_visible):
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    
+    live_area = st.container()
+    report = st.session_state.report.value if st.session_state.report is not None else None
+    
     with st.sidebar:
         st.header("Upload Medical Information")
         
@@ -296,38 +315,35 @@ def main():
         with report_tab:
             report_file = st.file_uploader(
                 "Upload a medical report",
-                type=['pdf', 'docx', 'txt', 'xml'],
+                type=['pdf', 'docx', 'txt', 'xml', 'png', 'jpg', 'jpeg'],
                 key="report_uploader"
             )
             
             if report_file:
-                temp_file_path = save_uploaded_file(report_file)
-                
                 try:
-                    raw_text = read_file(temp_file_path)
-                    st.session_state.report_text = preprocess_text(raw_text)
+                    # Reruns re-enter here on every interaction; only parse bytes no session has loaded
+                    file_extension = report_file.name.split('.')[-1].lower()
+                    report_key = content_key(report_file.getvalue(), file_extension)
+                    report = hold("report", report_key, lambda: load_report(report_file, file_extension, report_key))
                     st.session_state.uploaded_file_name = report_file.name
                     
                     st.success(f"✅ Report loaded: {report_file.name}")
                     
                     with st.expander("Report Preview"):
-                        preview_text = st.session_state.report_text[:300] + "..." if len(st.session_state.report_text) > 300 else st.session_state.report_text
+                        preview_text = report.text[:300] + "..." if len(report.text) > 300 else report.text
                         st.text_area("Content", preview_text, height=150, disabled=True)
                     
+                    lab_table = report.lab_table
+                    if len(lab_table):
+                        with st.expander(f"Lab Values ({len(lab_table.abnormal())} of {len(lab_table)} out of range)"):
+                            st.dataframe(lab_table.records(), hide_index=True)
+                    
                     if st.button("Analyze Report"):
-                        with st.spinner("Analyzing report..."):
-                            analysis = analyze_report(st.session_state.report_text)
-                            st.session_state.chat_history.append({
-                                "role": "assistant", 
-                                "content": f"📋 **Report Analysis**\n\n{analysis}"
-                            })
-                            st.success("Analysis complete! Check the chat area.")
+                        run_analysis("report", "📋 **Report Analysis**", analyze_report, report.text,
+                                     lab_table=report.lab_table, live_area=live_area, conversation=conversation)
                 
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
-                finally:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
         
         with image_tab:
             image_file = st.file_uploader(
@@ -338,33 +354,31 @@ def main():
             
             if image_file:
                 try:
-                    image = Image.open(image_file)
-                    st.session_state.uploaded_image = image
-                    st.image(image, caption="Uploaded image", use_column_width=True)
+                    # Decode, downscale and base64-encode once per image, not on every call
+                    image_bytes = image_file.getvalue()
+                    image_policy = policy_from_settings(st.secrets.get("image", {}))
+                    image_parts = hold(
+                        "image",
+                        payload_key(image_bytes, image_policy),
+                        lambda: load_image(image_bytes, image_policy),
+                    )
+                    st.image(image_bytes, caption="Uploaded image", use_column_width=True)
                     
                     if st.button("Analyze Image"):
-                        with st.spinner("Analyzing image..."):
-                            analysis = process_image(image)
-                            st.session_state.chat_history.append({
-                                "role": "assistant", 
-                                "content": f"🖼️ **Image Analysis**\n\n{analysis}"
-                            })
-                            st.success("Analysis complete! Check the chat area.")
+                        run_analysis("image", "🖼️ **Image Analysis**", process_image, image_parts,
+                                     live_area=live_area, conversation=conversation)
                 
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
         
         if st.button("Clear All Uploads"):
-            st.session_state.report_text = None
+            release("report")
+            release("image")
+            report = None
             st.session_state.uploaded_file_name = None
-            st.session_state.uploaded_image = None
             st.success("All uploads cleared!")
     
-    st.header("💬 Chat")
-    
-    for message in st.session_state.chat_history:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    show_jobs(live_area, conversation)
     
     prompt = "Ask about your health or uploaded medical information..."
     user_message = st.chat_input(prompt)
@@ -372,22 +386,96 @@ def main():
     if user_message:
         with st.chat_message("user"):
             st.markdown(user_message)
-        st.session_state.chat_history.append({"role": "user", "content": user_message})
         
-        with st.spinner("Generating response..."):
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
             response = chat_with_context(
                 user_message,
-                report_text=st.session_state.report_text,
-                image=st.session_state.uploaded_image
+                report_text=report.text if report else None,
+                image=st.session_state.image.value if st.session_state.image is not None else None,
+                report_index=report.index if report else None,
+                placeholder=placeholder,
+                lab_table=report.lab_table if report else None,
+                conversation=conversation,
             )
-        
-        with st.chat_message("assistant"):
-            st.markdown(response)
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
+            placeholder.markdown(response)
+        # Added after the call so the window sent with the question holds only earlier turns
+        conversation.append("user", user_message)
+        conversation.append("assistant", response)
     
-    if st.session_state.chat_history and st.button("Clear Chat History"):
-        st.session_state.chat_history = []
+    if len(conversation) and st.button("Clear Chat History"):
+        conversation.clear()
+        st.session_state.chat_visible = page_size
         st.success("Chat history cleared!")
+    
+    admin_panel()
+
+def run_analysis(kind, label, analyze, *args, live_area=None, conversation=None, **options):
+    """Run an analysis as a background job, or stream it into live_area if [jobs] BACKGROUND is false"""
+    services = get_services()
+    if services.secrets.get("jobs", {}).get("BACKGROUND", True):
+        job_id = get_job_queue().submit(st.session_state.session_id, kind, analyze, *args, label=label,
+                                        services=services, **options)
+        st.session_state.pending_jobs.append(job_id)
+        st.success("Analysis started; it will appear in the chat when ready.")
+        return
+    with live_area.chat_message("assistant"):
+        st.markdown(label)
+        placeholder = st.empty()
+        try:
+            analysis = analyze(*args, placeholder=placeholder, services=services, **options)
+        except Exception as e:
+            analysis = ANALYSIS_ERRORS[kind].format(error=e)
+        placeholder.markdown(analysis)
+    conversation.append("assistant", f"{label}\n\n{analysis}")
+    st.success("Analysis complete! Check the chat area.")
+
+def show_jobs(live_area, conversation):
+    """Poll this session's background analyses, moving finished ones into the chat"""
+    if not st.session_state.pending_jobs:
+        return
+
+    @st.fragment(run_every=st.secrets.get("jobs", {}).get("POLL_SECONDS", 1))
+    def poll():
+        finished = False
+        for job_id in list(st.session_state.pending_jobs):
+            job = get_job_queue().get(job_id)
+            if job is None or job.status in FINISHED:
+                st.session_state.pending_jobs.remove(job_id)
+                if job is not None:
+                    content = job.result if job.status == DONE else ANALYSIS_ERRORS[job.kind].format(error=job.error)
+                    conversation.append("assistant", f"{job.label}\n\n{content}")
+                finished = True
+                continue
+            with st.chat_message("assistant"):
+                st.markdown(job.label)
+                st.caption(f"⏳ {job.status.capitalize()} for {time.time() - job.created:.0f}s")
+        if finished:
+            # Redraw the whole page so the result joins the chat history
+            st.rerun()
+
+    with live_area:
+        poll()
+
+def admin_panel():
+    """Live stage percentiles and metric exports, shown only with ?admin=<[telemetry] ADMIN_TOKEN>"""
+    settings = st.secrets.get("telemetry", {})
+    token = settings.get("ADMIN_TOKEN")
+    if not token or st.query_params.get("admin") != token:
+        return
+
+    @st.fragment(run_every=settings.get("REFRESH_SECONDS", 5))
+    def live_metrics():
+        telemetry = get_telemetry()
+        st.dataframe(telemetry.summary(), hide_index=True)
+        st.caption("Most recent spans")
+        st.dataframe(telemetry.recent(50), hide_index=True)
+        st.download_button("Prometheus metrics", telemetry.prometheus(), "metrics.txt")
+        st.download_button("Recent spans (JSON)", json.dumps(telemetry.recent(telemetry.window), default=str),
+                           "spans.json")
+
+    with st.expander("⚙️ Pipeline metrics", expanded=True):
+        live_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
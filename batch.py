@@ -0,0 +1,204 @@
+"""Analyze a folder (or manifest) of medical reports and images without Streamlit.
+
+Usage:
+    python batch.py reports/ --output results.jsonl --deployment gpt-4o
+
+Reports and images are parsed in a process pool and analyzed by a bounded
+pool of API workers sharing one LLMProvider (pooled connections, rate limits,
+retries with backoff). Files are parsed only as analysis slots free up, so
+memory stays flat however many files are queued. Every result is appended to
+the output JSONL as soon as it finishes, and files already recorded as "ok"
+there are skipped, so an interrupted run resumes where it stopped.
+
+Azure OpenAI credentials come from AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY
+and OPENAI_API_VERSION; with --provider openai, OPENAI_API_KEY and --base-url
+are used instead (e.g. Groq's OpenAI-compatible endpoint or a local stub).
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from analysis import image_request, report_prompt, report_request
+from image_pipeline import ImagePolicy, encode_image
+from lab_values import LabTable
+from llm_client import LLMProvider
+from report_parser import IMAGE_TYPES, SUPPORTED_TYPES, preprocess_text, read_bytes
+
+
+def collect_inputs(source):
+    """List the files to analyze from a directory or a manifest (one path per line)"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as manifest:
+            paths = [os.path.join(base, line.strip()) for line in manifest
+                     if line.strip() and not line.startswith('#')]
+    return [path for path in paths if path.rsplit('.', 1)[-1].lower() in SUPPORTED_TYPES]
+
+
+def load_checkpoint(output_path):
+    """Return the set of paths already analyzed successfully in output_path"""
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as results:
+            for line in results:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a torn final line from an interrupted run
+                if record.get("status") == "ok":
+                    done.add(record["path"])
+    return done
+
+
+def parse_input(path):
+    """Parse one input in a worker process: report text for documents, encoded parts for images"""
+    file_type = path.rsplit('.', 1)[-1].lower()
+    with open(path, 'rb') as file:
+        data = file.read()
+    if file_type in IMAGE_TYPES:
+        return "image", encode_image(data, ImagePolicy())
+    # Already inside a pool worker, so keep PDF extraction in this process
+    return "report", preprocess_text(read_bytes(data, file_type, workers=1))
+
+
+class Analyzer:
+    """Analyzes parsed reports and images through an LLMProvider
+
+    The provider enforces the concurrency cap, rate limits and retries, so
+    parallel map-reduce calls from several reports share the same budget.
+    """
+
+    def __init__(self, provider, model, max_in_flight=4, chunk_tokens=3000):
+        self.provider = provider
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.chunk_tokens = chunk_tokens
+
+    def analyze(self, kind, payload):
+        """Analyze parsed report text or encoded image parts"""
+        if kind == "image":
+            return self.provider.complete_sync(**image_request(self.model, payload))
+        prompt = report_prompt(
+            payload,
+            lambda text, max_tokens: self.provider.complete_sync(**report_request(self.model, text, max_tokens)),
+            chunk_tokens=self.chunk_tokens,
+            findings=LabTable.from_text(payload).findings(),
+            max_in_flight=self.max_in_flight,
+        )
+        return self.provider.complete_sync(**report_request(self.model, prompt))
+
+
+def build_provider(args):
+    options = dict(
+        max_concurrency=args.api_workers,
+        max_connections=args.api_workers,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        max_retries=args.max_retries,
+        timeout=args.timeout,
+    )
+    if args.provider == "azure":
+        return LLMProvider.azure(
+            os.environ["AZURE_OPENAI_ENDPOINT"],
+            os.environ["AZURE_OPENAI_API_KEY"],
+            os.environ.get("OPENAI_API_VERSION", "2024-06-01"),
+            **options,
+        )
+    return LLMProvider.openai_compatible(args.base_url, os.environ.get("OPENAI_API_KEY", "unused"), **options)
+
+
+def run(paths, analyzer, output_path, parse_workers):
+    """Parse and analyze paths, appending one JSON record per file to output_path"""
+    lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    def record(path, status, started, **fields):
+        entry = {"path": path, "status": status, "elapsed_s": round(time.monotonic() - started, 3), **fields}
+        with lock:
+            results.write(json.dumps(entry) + "\n")
+            results.flush()
+            counts[status] += 1
+
+    def analyze(path, kind, payload, started):
+        try:
+            record(path, "ok", started, kind=kind, analysis=analyzer.analyze(kind, payload))
+        except Exception as e:
+            record(path, "error", started, kind=kind, error=f"{type(e).__name__}: {e}")
+
+    with open(output_path, 'a', encoding='utf-8') as results, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parsers, \
+            ThreadPoolExecutor(max_workers=analyzer.max_in_flight) as api_workers:
+        pending = iter(paths)
+        started = {}
+        parsing = {}
+        analyzing = set()
+        # Parsed payloads wait in memory for an API worker, so a new file is
+        # only parsed once an earlier one has been analyzed
+        limit = (parse_workers or os.cpu_count() or 1) + analyzer.max_in_flight
+        while True:
+            while len(parsing) + len(analyzing) < limit:
+                path = next(pending, None)
+                if path is None:
+                    break
+                started[path] = time.monotonic()
+                parsing[parsers.submit(parse_input, path)] = path
+            if not parsing and not analyzing:
+                break
+            finished, _ = wait([*parsing, *analyzing], return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in analyzing:
+                    analyzing.remove(future)
+                    continue
+                path = parsing.pop(future)
+                try:
+                    kind, payload = future.result()
+                except Exception as e:
+                    record(path, "error", started.pop(path), error=f"{type(e).__name__}: {e}")
+                    continue
+                analyzing.add(api_workers.submit(analyze, path, kind, payload, started.pop(path)))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory of reports/images, or a manifest file listing paths")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file (also the checkpoint)")
+    parser.add_argument("--provider", choices=["azure", "openai"], default="azure")
+    parser.add_argument("--deployment", "--model", dest="model", required=True,
+                        help="Azure deployment name or model id")
+    parser.add_argument("--base-url", help="API base URL for --provider openai")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--api-workers", type=int, default=8, help="maximum concurrent API requests")
+    parser.add_argument("--requests-per-minute", type=float, help="provider request rate limit")
+    parser.add_argument("--tokens-per-minute", type=float, help="provider token rate limit")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    args = parser.parse_args(argv)
+
+    done = load_checkpoint(args.output)
+    paths = [path for path in collect_inputs(args.source) if path not in done]
+    print(f"{len(paths)} files to analyze ({len(done)} already done)", file=sys.stderr)
+    if not paths:
+        return 0
+
+    provider = build_provider(args)
+    analyzer = Analyzer(provider, args.model, max_in_flight=args.api_workers, chunk_tokens=args.chunk_tokens)
+    try:
+        counts = run(paths, analyzer, args.output, args.parse_workers)
+    finally:
+        provider.close()
+    print(f"{counts['ok']} analyzed, {counts['error']} failed -> {args.output}", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Measure report memory as sessions scale: a private copy per session against shared DocumentStore handles.
+
+Each simulated session opens the same discharge report. Per-session copies
+parse and index it once per session, as app.py did before the store; with
+the store every session holds a Handle to one shared entry.
+
+Usage: python benchmarks/bench_document_store.py [--lines 20000] [--sessions 1 10 50]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import report_lines  # noqa: E402
+from document_store import DocumentStore, estimate_size  # noqa: E402
+from lab_values import LabTable  # noqa: E402
+from report_cache import content_key  # noqa: E402
+from report_parser import preprocess_text  # noqa: E402
+from retrieval import ReportIndex  # noqa: E402
+
+
+def load(raw):
+    text = preprocess_text(raw.decode('utf-8'))
+    return text, ReportIndex.from_text(text), LabTable.from_text(text)
+
+
+def measure(open_session, session_count):
+    """Return (MB retained, seconds) for session_count sessions each opening the report"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    sessions = [open_session() for _ in range(session_count)]
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return retained / 2 ** 20, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    raw = "\n".join(report_lines(args.lines)).encode('utf-8')
+    key = content_key(raw, 'txt')
+    print(f"report: {len(raw) / 2 ** 20:.1f} MB raw, {estimate_size(load(raw)) / 2 ** 20:.1f} MB extracted and indexed")
+    for session_count in args.sessions:
+        copies_mb, copies_s = measure(lambda: load(raw), session_count)
+        store = DocumentStore()
+        shared_mb, shared_s = measure(lambda: store.acquire(key, lambda: load(raw)), session_count)
+        print(f"{session_count:>4} sessions: per-session copies {copies_mb:8.1f} MB in {copies_s:6.2f}s, "
+              f"shared store {shared_mb:6.1f} MB in {shared_s:6.2f}s ({store.stats()['misses']} parse)")
+
+
+if __name__ == "__main__":
+    main()
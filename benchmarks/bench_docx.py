@@ -0,0 +1,71 @@
+"""Compare the streaming DOCX extractor with the previous python-docx paragraph loop.
+
+The legacy path builds python-docx's whole object model and reads only
+doc.paragraphs, so text in tables (lab results, medication lists) is lost;
+the "rows" columns count the table rows each path returned. Peaks include
+the returned text; "iter MB" is the streaming extractor's own peak.
+
+Usage: python benchmarks/bench_docx.py [--lines 2000 20000 100000]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_docx  # noqa: E402
+from report_parser import docx_to_text, iter_docx_text  # noqa: E402
+
+
+def legacy_read(data):
+    """What read_bytes did for DOCX before docx_to_text"""
+    from docx import Document
+
+    doc = Document(io.BytesIO(data))
+    return '\n'.join([para.text for para in doc.paragraphs])
+
+
+def streaming_read(data):
+    return docx_to_text(io.BytesIO(data))
+
+
+def consume(data):
+    return sum(len(line) for line in iter_docx_text(io.BytesIO(data)))
+
+
+def measure(func, data):
+    """Return (seconds, peak bytes, result); timed without tracemalloc, which slows parsing unevenly"""
+    start = time.perf_counter()
+    func(data)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[2000, 20000, 100000])
+    args = parser.parse_args()
+
+    legacy_read(make_docx(10))  # import python-docx outside the timings
+    print(f"{'paragraphs':>10} {'size':>9}  {'legacy s':>8} {'peak MB':>8} {'rows':>5}  "
+          f"{'stream s':>8} {'peak MB':>8} {'iter MB':>8} {'rows':>5}  speedup")
+    for lines in args.lines:
+        data = make_docx(lines)
+        legacy_time, legacy_peak, legacy_text = measure(legacy_read, data)
+        stream_time, stream_peak, text = measure(streaming_read, data)
+        _, iter_peak, _ = measure(consume, data)
+        print(f"{lines:>10} {len(data) / 1e6:>7.2f}MB  "
+              f"{legacy_time:>8.3f} {legacy_peak / 1e6:>8.1f} {legacy_text.count(chr(9)) // 2:>5}  "
+              f"{stream_time:>8.3f} {stream_peak / 1e6:>8.1f} {iter_peak / 1e6:>8.1f} {text.count(chr(9)) // 2:>5}  "
+              f"x{legacy_time / stream_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare the previous full-resolution JPEG/base64 encode with encode_image.
+
+The legacy encode ran on every analysis and every chat turn; encode_image runs
+once per uploaded image and its parts are reused from session state.
+
+Usage: python benchmarks/bench_image.py [--sizes 1024x1024 3000x4000]
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from benchmarks.synthetic import make_scan_image  # noqa: E402
+from image_pipeline import ImagePolicy, encode_image  # noqa: E402
+
+
+def legacy_encode(data):
+    """What process_image and chat_with_context did on every call"""
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode('ascii')
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1024x1024", "2048x2500", "3000x4000"])
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'legacy ms':>10} {'legacy KB':>10} {'new ms':>8} {'new KB':>8}")
+    for size in args.sizes:
+        width, height = map(int, size.split('x'))
+        data = make_scan_image(width, height)
+        legacy_time, legacy_payload = timed(legacy_encode, data)
+        new_time, parts = timed(encode_image, data, ImagePolicy())
+        new_bytes = sum(len(part["image_url"]["url"]) for part in parts)
+        print(f"{size:>10} {legacy_time * 1000:>10.1f} {len(legacy_payload) / 1024:>10.1f} "
+              f"{new_time * 1000:>8.1f} {new_bytes / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
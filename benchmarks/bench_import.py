@@ -0,0 +1,91 @@
+"""Measure the cold-start import cost of the app's own modules with -X importtime.
+
+Usage: python benchmarks/bench_import.py [--runs 5] [--budget-ms 150] [--json out.json]
+
+Exits non-zero if the import time exceeds --budget-ms, or if any module that
+should only load on first use (parsers, OCR, imaging, API SDKs) is imported
+at startup. CI runs this on every push.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything app.py and agent.py import at startup, apart from Streamlit itself
+APP_MODULES = [
+    "report_cache", "report_parser", "analysis", "chunking", "summarizer", "retrieval",
+    "response_cache", "streaming", "llm_client", "image_pipeline", "redaction", "lab_values", "conversation",
+    "document_store", "telemetry", "jobs",
+]
+
+# Heavy dependencies that must stay deferred until a feature needs them
+LAZY_MODULES = ["PyPDF2", "docx", "pytesseract", "PIL", "openai", "groq", "numpy", "pandas", "httpx"]
+
+
+def import_profile(code):
+    """Run code in a fresh interpreter; return [(module, cumulative µs, nested)] for every module loaded"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    profile = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module that triggered them
+        profile.append((name.strip(), int(cumulative), name[1:].startswith(" ")))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the total exceeds this")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    # Modules the interpreter loads before running -c are never re-imported
+    startup = {name for name, _, _ in import_profile("pass")}
+    code = "import " + ", ".join(APP_MODULES)
+
+    # Take the fastest run to filter out scheduler and disk noise. The total is
+    # the top-level cumulative time of the single import statement; the
+    # per-module figures overlap where one app module imports another.
+    best = {}
+    best_total = float("inf")
+    loaded = set()
+    for _ in range(args.runs):
+        profile = import_profile(code)
+        loaded |= {name for name, _, _ in profile}
+        best_total = min(best_total, sum(cumulative for name, cumulative, nested in profile
+                                         if not nested and name not in startup))
+        cumulative_by_module = {name: cumulative for name, cumulative, _ in profile}
+        for module in APP_MODULES:
+            best[module] = min(best.get(module, float("inf")), cumulative_by_module.get(module, 0))
+    total_ms = best_total / 1000
+
+    for module, micros in sorted(best.items(), key=lambda item: -item[1]):
+        print(f"{module:<16} {micros / 1000:>8.2f} ms")
+    print(f"{'total':<16} {total_ms:>8.2f} ms")
+
+    eager = sorted(module for module in LAZY_MODULES if module in loaded)
+    if eager:
+        print(f"imported eagerly (should be lazy): {', '.join(eager)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump({"modules_ms": {m: v / 1000 for m, v in best.items()}, "total_ms": total_ms,
+                       "eager_imports": eager}, output, indent=2)
+
+    over_budget = args.budget_ms is not None and total_ms > args.budget_ms
+    if over_budget:
+        print(f"import time {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    return 1 if eager or over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Compare serial PDF text extraction with the page-sharded process pool.
+
+Usage: python benchmarks/bench_pdf_extraction.py [--pages 50 200 500] [--workers 4]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2  # noqa: E402
+
+from benchmarks.synthetic import make_pdf  # noqa: E402
+from report_parser import extract_pdf_text  # noqa: E402
+
+
+def serial_extract(data):
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return ''.join([page.extract_text() for page in reader.pages])
+
+
+def best_of(repeat, func, *args, **kwargs):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'serial s':>10} {'pooled s':>10} {'speedup':>8}")
+    for pages in args.pages:
+        data = make_pdf(pages)
+        serial_time, serial_text = best_of(args.repeat, serial_extract, data)
+        pooled_time, pooled_text = best_of(args.repeat, extract_pdf_text, data, workers=args.workers)
+        assert serial_text == pooled_text, "pooled extraction changed the output"
+        print(f"{pages:>6} {serial_time:>10.3f} {pooled_time:>10.3f} {serial_time / pooled_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Time every stage of the report pipeline and end-to-end analysis against a local mock LLM.
+
+Stages, per format and size: parse (read_bytes), preprocess (redaction),
+lab table, retrieval index and prompt build. Images: encode_image. End to
+end: parse, preprocess and analyze synthetic reports through LLMProvider
+against benchmarks/mock_llm_server.py at each concurrency level, plus
+streamed chat turns for time to first token. Everything is generated from
+fixed seeds, so runs on different commits are comparable.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 5 50 200] [--concurrency 1 8 32] [--json out.json]
+       python benchmarks/bench_pipeline.py --compare baseline.json --json out.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import chat_request, report_prompt, report_request  # noqa: E402
+from benchmarks.mock_llm_server import start_server  # noqa: E402
+from benchmarks.synthetic import make_ccd, make_docx, make_pdf, make_scan_image, make_txt  # noqa: E402
+from image_pipeline import ImagePolicy, encode_image  # noqa: E402
+from lab_values import LabTable  # noqa: E402
+from llm_client import LLMProvider  # noqa: E402
+from report_parser import preprocess_text, read_bytes  # noqa: E402
+from retrieval import ReportIndex  # noqa: E402
+from telemetry import percentile  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINES_PER_PAGE = 45
+
+# Each size is a page count; every format carries about the same text per page
+DOCUMENTS = {
+    "pdf": lambda pages: make_pdf(pages, LINES_PER_PAGE),
+    "docx": lambda pages: make_docx(pages * LINES_PER_PAGE),
+    "txt": lambda pages: make_txt(pages * LINES_PER_PAGE),
+    "xml": lambda pages: make_ccd(pages, rows_per_section=LINES_PER_PAGE // 2),
+}
+
+QUESTIONS = ["Is my potassium high?", "What does the chest radiograph show?", "What follow-up do I need?"]
+
+
+def summarize_latencies(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def timed(repeat, func, *args, **kwargs):
+    """Run func repeat times; return (median seconds, last result)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def local_complete(prompt, max_tokens):
+    """Stand-in for the map step so prompt build is timed without the network"""
+    return "Summary: " + prompt[:200]
+
+
+def stage_results(sizes, repeat, pdf_workers):
+    results = []
+    for file_type, make in DOCUMENTS.items():
+        for pages in sizes:
+            data = make(pages)
+            parse_s, raw = timed(repeat, read_bytes, data, file_type, workers=pdf_workers)
+            preprocess_s, text = timed(repeat, preprocess_text, raw)
+            labs_s, _ = timed(repeat, LabTable.from_text, text)
+            index_s, _ = timed(repeat, ReportIndex.from_text, text)
+            prompt_s, _ = timed(repeat, report_prompt, text, local_complete, max_in_flight=4)
+            row = {
+                "name": f"{file_type}-{pages}p", "format": file_type, "pages": pages,
+                "input_bytes": len(data), "text_chars": len(text),
+                "parse_ms": parse_s * 1000, "preprocess_ms": preprocess_s * 1000, "labs_ms": labs_s * 1000,
+                "index_ms": index_s * 1000, "prompt_ms": prompt_s * 1000,
+                "parse_mb_s": len(data) / 2 ** 20 / parse_s,
+            }
+            results.append(row)
+            print(f"{row['name']:>10} {len(data) / 1024:>9.0f} KB  parse {row['parse_ms']:>8.1f}  "
+                  f"preprocess {row['preprocess_ms']:>7.1f}  labs {row['labs_ms']:>6.1f}  "
+                  f"index {row['index_ms']:>7.1f}  prompt {row['prompt_ms']:>6.1f} ms")
+    return results
+
+
+def image_results(sizes, repeat):
+    results = []
+    for size in sizes:
+        width, height = map(int, size.split('x'))
+        data = make_scan_image(width, height)
+        encode_s, parts = timed(repeat, encode_image, data, ImagePolicy())
+        payload = sum(len(part["image_url"]["url"]) for part in parts)
+        results.append({"name": f"image-{size}", "input_bytes": len(data), "payload_bytes": payload,
+                        "encode_ms": encode_s * 1000})
+        print(f"{'image ' + size:>16} encode {encode_s * 1000:>7.1f} ms, payload {payload / 1024:.0f} KB")
+    return results
+
+
+def end_to_end(provider, documents, concurrency, request_count):
+    """Parse, preprocess and analyze request_count documents with concurrency workers"""
+    def analyze(index):
+        file_type, data = documents[index % len(documents)]
+        started = time.perf_counter()
+        text = preprocess_text(read_bytes(data, file_type, workers=1))
+        prompt = report_prompt(
+            text,
+            lambda p, max_tokens: provider.complete_sync(**report_request("stub", p, max_tokens)),
+            findings=LabTable.from_text(text).findings(),
+        )
+        provider.complete_sync(**report_request("stub", prompt))
+        return time.perf_counter() - started
+
+    def chat(index):
+        started = time.perf_counter()
+        deltas = provider.stream_sync(**chat_request("stub", QUESTIONS[index % len(QUESTIONS)], "Potassium 5.6"))
+        next(deltas)
+        first_token = time.perf_counter() - started
+        for _ in deltas:
+            pass
+        return first_token, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        analysis_latencies = list(pool.map(analyze, range(request_count)))
+        analysis_s = time.perf_counter() - started
+        started = time.perf_counter()
+        chat_timings = list(pool.map(chat, range(request_count)))
+        chat_s = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "analysis": {**summarize_latencies(analysis_latencies), "throughput_rps": request_count / analysis_s},
+        "chat": {**summarize_latencies([total for _, total in chat_timings]),
+                 "ttft": summarize_latencies([first for first, _ in chat_timings]),
+                 "throughput_rps": request_count / chat_s},
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def compare(baseline, current):
+    """Print the ratio of every matching *_ms metric between two result files"""
+    def metrics(results):
+        flat = {}
+        for row in results.get("stages", []) + results.get("images", []):
+            flat.update({f"{row['name']} {key}": value for key, value in row.items() if key.endswith("_ms")})
+        for row in results.get("end_to_end", []):
+            for kind in ("analysis", "chat"):
+                flat[f"c{row['concurrency']} {kind} p95_ms"] = row[kind]["p95_ms"]
+        return flat
+
+    before, after = metrics(baseline), metrics(current)
+    print(f"\ncompared with {baseline['environment'].get('commit') or 'baseline'}:")
+    for name in sorted(before.keys() & after.keys()):
+        ratio = after[name] / before[name] if before[name] else float("nan")
+        # Sub-millisecond stages are mostly timer noise
+        significant = max(before[name], after[name]) >= 1.0
+        marker = ("  slower" if ratio > 1.1 else "  faster" if ratio < 0.9 else "") if significant else ""
+        print(f"  {name:<32} {before[name]:>9.1f} -> {after[name]:>9.1f} ms  x{ratio:.2f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 200], help="document sizes in pages")
+    parser.add_argument("--image-sizes", nargs="+", default=["1024x1024", "3000x4000"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf-workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="end-to-end requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock time to first token, seconds")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="mock seconds between streamed tokens")
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "config": vars(args)}
+    results["stages"] = stage_results(args.sizes, args.repeat, args.pdf_workers)
+    results["images"] = image_results(args.image_sizes, args.repeat)
+
+    results["end_to_end"] = []
+    if not args.skip_e2e:
+        server, config, url = start_server(latency=args.latency, token_delay=args.token_delay, seed=0)
+        documents = [(file_type, make(min(args.sizes))) for file_type, make in DOCUMENTS.items()]
+        for concurrency in args.concurrency:
+            provider = LLMProvider.openai_compatible(f"{url}/v1", max_connections=concurrency,
+                                                     max_concurrency=concurrency)
+            try:
+                row = end_to_end(provider, documents, concurrency, args.requests)
+            finally:
+                provider.close()
+            results["end_to_end"].append(row)
+            analysis, chat = row["analysis"], row["chat"]
+            print(f"concurrency {concurrency:>3}: analysis {analysis['throughput_rps']:6.1f} req/s "
+                  f"p50/p95/p99 {analysis['p50_ms']:.0f}/{analysis['p95_ms']:.0f}/{analysis['p99_ms']:.0f} ms; "
+                  f"chat ttft p50/p95 {chat['ttft']['p50_ms']:.0f}/{chat['ttft']['p95_ms']:.0f} ms")
+        results["mock_requests"] = config.requests
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            compare(json.load(baseline), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Measure preprocessing throughput in MB/s: the legacy two-pass re.sub against the single-pass Redactor.
+
+The legacy function only redacts "Patient ID: <digits>"; the one-pass-per-
+identifier baseline is what extending it to every identifier type would cost.
+
+Usage: python benchmarks/bench_redaction.py [--lines 20000 200000] [--chunk-kb 64] [--names 0 1000]
+
+Also checks every case in redaction_corpus.jsonl, that chunked and
+whole-text redaction agree, and that no planted identifier survives;
+exits non-zero if any check fails.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import FIRST_NAMES, LAST_NAMES, make_phi_report  # noqa: E402
+from redaction import Redactor  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "redaction_corpus.jsonl")
+
+
+def legacy_preprocess(text):
+    """The preprocess_text that preceded the Redactor"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'Patient ID:\s*\d+', '[REDACTED]', text)
+    return text.strip()
+
+
+# One re.sub pass per identifier type: what adding identifiers to the legacy function would cost
+MULTIPASS_PATTERNS = [
+    re.compile(r'\s+'),
+    re.compile(r'\b(?:Patient ID|MRN|Medical Record Number|Account)\s*[:#]*\s*[A-Z0-9-]*\d[A-Z0-9-]*'),
+    re.compile(r'\b(?:DOB|Date of Birth)\s*:?\s*\d{1,2}/\d{1,2}/\d{2,4}'),
+    re.compile(r'\b(?:Patient(?: Name)?|Name)\s*:\s*[A-Z][A-Za-z\'-]+(?:,? [A-Z][A-Za-z\'-]+){1,3}'),
+    re.compile(r'\b(?:Mr|Mrs|Ms)\.? [A-Z][A-Za-z\'-]+'),
+    re.compile(r'\b\d{3}-\d{2}-\d{4}\b'),
+    re.compile(r'(?:\(\d{3}\) ?|\b\d{3}[ .-])\d{3}[ .-]\d{4}\b'),
+    re.compile(r'\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b'),
+]
+
+
+def multipass_preprocess(text):
+    text = MULTIPASS_PATTERNS[0].sub(' ', text)
+    for pattern in MULTIPASS_PATTERNS[1:]:
+        text = pattern.sub('[REDACTED]', text)
+    return text.strip()
+
+
+def throughput(func, text, repeat=3):
+    best = min(timed(func, text) for _ in range(repeat))
+    return len(text.encode('utf-8')) / 1e6 / best
+
+
+def timed(func, text):
+    start = time.perf_counter()
+    func(text)
+    return time.perf_counter() - start
+
+
+def chunked(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def check_corpus():
+    failures = 0
+    with open(CORPUS, 'r', encoding='utf-8') as corpus:
+        for line in corpus:
+            case = json.loads(line)
+            got = Redactor().redact(case["text"])
+            if got != case["expected"]:
+                failures += 1
+                print(f"corpus mismatch: {case['text']!r}\n  expected {case['expected']!r}\n  got      {got!r}")
+    return failures
+
+
+def dictionary(size):
+    """Return size distinct synthetic full names for the known-name dictionary"""
+    names = [f"{first}{index} {last}" for index in range(size // 64 + 1)
+             for first in FIRST_NAMES for last in LAST_NAMES]
+    return names[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[20000, 200000])
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    parser.add_argument("--names", type=int, nargs="+", default=[0, 1000],
+                        help="known-name dictionary sizes to compare")
+    args = parser.parse_args()
+
+    failures = check_corpus()
+    for lines in args.lines:
+        text, identifiers = make_phi_report(lines)
+        size = len(text.encode('utf-8')) / 1e6
+        print(f"{lines} lines ({size:.1f} MB): legacy {throughput(legacy_preprocess, text):.1f} MB/s, "
+              f"one pass per identifier {throughput(multipass_preprocess, text):.1f} MB/s")
+        for name_count in args.names:
+            redactor = Redactor(names=dictionary(name_count))
+            whole = redactor.redact(text)
+            stream = ''.join(redactor.redact_chunks(chunked(text, args.chunk_kb * 1024)))
+            leaked = [value for value in identifiers if value in whole]
+            print(f"  redactor, {name_count:>5} known names: "
+                  f"whole {throughput(redactor.redact, text):.1f} MB/s, "
+                  f"{args.chunk_kb} KB chunks "
+                  f"{throughput(lambda t: ''.join(redactor.redact_chunks(chunked(t, args.chunk_kb * 1024))), text):.1f} MB/s"
+                  + (f"  LEAKED {leaked}" if leaked else ""))
+            failures += bool(leaked) + (stream != whole)
+            if stream != whole:
+                print("  chunked output differs from whole-text output")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
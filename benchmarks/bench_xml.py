@@ -0,0 +1,81 @@
+"""Compare the streaming XML extractor with the previous recursive xml_to_text.
+
+The legacy CCD numbers are flattering: its un-namespaced './/section' lookup
+finds nothing in a real (namespaced) CDA document, so it extracts no text.
+
+Usage: python benchmarks/bench_xml.py [--sections 500 2000 8000] [--depth 8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_ccd, make_nested_xml  # noqa: E402
+from report_parser import xml_to_text  # noqa: E402
+
+
+def legacy_xml_to_text(element):
+    """The recursive implementation that preceded iter_xml_text"""
+    text_parts = []
+    if element.tag.endswith('ClinicalDocument'):
+        for section in element.findall('.//section'):
+            title = section.find('title')
+            text = section.find('text')
+            if title is not None:
+                text_parts.append(title.text.strip())
+            if text is not None:
+                text_parts.append(text.text.strip())
+    else:
+        for child in element:
+            if child.text and child.text.strip():
+                text_parts.append(child.text.strip())
+            text_parts.extend(legacy_xml_to_text(child))
+    return '\n'.join(filter(None, text_parts))
+
+
+def legacy_read(data):
+    return legacy_xml_to_text(ET.parse(io.BytesIO(data)).getroot())
+
+
+def streaming_read(data):
+    return xml_to_text(io.BytesIO(data))
+
+
+def measure(func, data):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = func(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, text
+
+
+def report(label, data):
+    legacy_time, legacy_peak, legacy_text = measure(legacy_read, data)
+    stream_time, stream_peak, text = measure(streaming_read, data)
+    print(f"{label:<22} {len(data) / 1e6:>7.2f} MB  "
+          f"legacy {legacy_time:>7.3f}s {legacy_peak / 1e6:>8.1f} MB peak  "
+          f"streaming {stream_time:>7.3f}s {stream_peak / 1e6:>6.1f} MB peak  "
+          f"chars legacy/streaming {len(legacy_text)}/{len(text)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--depth", type=int, nargs="+", default=[6, 8])
+    args = parser.parse_args()
+
+    for sections in args.sections:
+        report(f"CCD {sections} sections", make_ccd(sections))
+    for depth in args.depth:
+        report(f"nested XML depth {depth}", make_nested_xml(depth))
+
+
+if __name__ == "__main__":
+    main()
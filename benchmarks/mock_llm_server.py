@@ -0,0 +1,135 @@
+"""OpenAI/Azure/Groq-compatible chat completions stub with configurable latency and failures.
+
+Usage: python benchmarks/mock_llm_server.py --port 8900 --latency 0.5 --error-rate 0.05
+
+Any POST path ending in /chat/completions is answered, so it serves as
+  Azure:  azure_endpoint=http://127.0.0.1:8900   (…/openai/deployments/<name>/chat/completions)
+  OpenAI/Groq-compatible: base_url=http://127.0.0.1:8900/v1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("The report shows mildly elevated potassium and low hemoglobin; "
+         "please follow up with your doctor for a repeat blood panel.").split()
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, jitter=0.1, token_delay=0.005, tokens=60, error_rate=0.0, seed=None):
+        self.latency = latency          # seconds to the first byte / first token
+        self.jitter = jitter            # +/- uniform jitter applied to latency
+        self.token_delay = token_delay  # seconds between streamed tokens
+        self.tokens = tokens            # words per response
+        self.error_rate = error_rate    # fraction of requests answered with 429 or 503
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body, headers=()):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            try:
+                self._respond()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (timeout or a won hedge); nothing to report
+
+        def _respond(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.split("?")[0].endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": "not found"}})
+
+            with config.lock:
+                config.requests += 1
+                fail = config.random.random() < config.error_rate
+                delay = max(0.0, config.latency + config.random.uniform(-config.jitter, config.jitter))
+            time.sleep(delay)
+            if fail:
+                status = random.choice([429, 503])
+                return self._json(status, {"error": {"message": "stub failure", "code": str(status)}},
+                                  headers=[("Retry-After", "0.05")])
+
+            model = request.get("model", "stub")
+            max_tokens = request.get("max_tokens") or request.get("max_completion_tokens") or config.tokens
+            words = [WORDS[i % len(WORDS)] for i in range(min(config.tokens, max_tokens))]
+            if request.get("stream"):
+                return self._stream(model, words)
+            self._json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"prompt_tokens": len(json.dumps(request.get("messages", []))) // 4,
+                          "completion_tokens": len(words), "total_tokens": 0},
+            })
+
+        def _stream(self, model, words):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data):
+                event = f"data: {data}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+
+            for index, word in enumerate(words):
+                send(json.dumps({
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": {"content": (" " if index else "") + word},
+                                                 "finish_reason": None}],
+                }))
+                time.sleep(config.token_delay)
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def start_server(port=0, **options):
+    """Start the stub in a background thread; returns (server, config, root URL)"""
+    config = StubConfig(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, _, url = start_server(args.port, latency=args.latency, jitter=args.jitter,
+                                  token_delay=args.token_delay, tokens=args.tokens, error_rate=args.error_rate)
+    print(f"stub chat completions listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
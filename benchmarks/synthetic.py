@@ -0,0 +1,230 @@
+"""Synthetic medical report generators shared by the benchmark scripts."""
+import random
+
+SECTION_TITLES = [
+    "CHIEF COMPLAINT", "HISTORY OF PRESENT ILLNESS", "PAST MEDICAL HISTORY",
+    "MEDICATIONS", "ALLERGIES", "LABORATORY RESULTS", "IMAGING",
+    "ASSESSMENT AND PLAN", "DISCHARGE INSTRUCTIONS",
+]
+
+LAB_LINES = [
+    "Hemoglobin 11.2 g/dL (13.5-17.5)",
+    "White Blood Cell Count 12.4 x10^9/L (4.0-11.0)",
+    "Platelets 250 x10^9/L (150-400)",
+    "Sodium 138 mmol/L (135-145)",
+    "Potassium 5.6 mmol/L (3.5-5.1)",
+    "Creatinine 1.4 mg/dL (0.6-1.2)",
+    "Glucose 182 mg/dL (70-99)",
+]
+
+SENTENCES = [
+    "Patient reports intermittent chest pain radiating to the left arm.",
+    "No fever, chills or night sweats were noted during the admission.",
+    "Vital signs remained stable throughout the hospital course.",
+    "Continue metformin 500 mg twice daily with meals.",
+    "Follow up with cardiology in two weeks for a stress test.",
+    "Chest radiograph shows no acute cardiopulmonary process.",
+    "Patient ID: 00482913 was reviewed by the attending physician.",
+]
+
+
+def report_lines(line_count, seed=0):
+    """Return line_count lines of plausible report text, deterministic for a seed"""
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < line_count:
+        lines.append(rng.choice(SECTION_TITLES) + ":")
+        for _ in range(rng.randint(3, 8)):
+            lines.append(rng.choice(LAB_LINES + SENTENCES))
+    return lines[:line_count]
+
+
+FIRST_NAMES = ["Jane", "Omar", "Priya", "Lucas", "Mei", "Grace", "Tomasz", "Amara"]
+LAST_NAMES = ["Doe", "Haddad", "Raman", "Silva", "Chen", "Okafor", "Nowak", "Lindqvist"]
+
+
+def make_phi_report(line_count, seed=0):
+    """Return (text, identifiers): report lines with a PHI header and identifiers sprinkled through"""
+    rng = random.Random(seed)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    mrn = f"{rng.randrange(10 ** 7, 10 ** 8)}"
+    phone = f"({rng.randrange(200, 999)}) {rng.randrange(200, 999)}-{rng.randrange(1000, 9999)}"
+    email = f"{first.lower()}.{last.lower()}@example.org"
+    ssn = f"{rng.randrange(100, 899)}-{rng.randrange(10, 99)}-{rng.randrange(1000, 9999)}"
+    header = [
+        f"Patient Name: {last}, {first}    MRN: {mrn}",
+        f"DOB: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1930, 2005)}",
+        f"Phone: {phone}\tEmail: {email}",
+    ]
+    mentions = [
+        f"{first} {last} was counselled on the plan.",
+        f"Contact {phone} with questions.",
+        f"Results were sent to {email}.",
+        f"SSN {ssn} verified at registration.",
+        f"Mr. {last} tolerated the procedure well.",
+    ]
+    lines = header + report_lines(line_count, seed)
+    for index in range(len(header), len(lines), 25):
+        lines.insert(index, rng.choice(mentions))
+    identifiers = [first, last, mrn, phone, email, ssn]
+    return '\n'.join(lines[:line_count]), identifiers
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(page_count, lines_per_page=45, seed=0):
+    """Build a text-layer PDF with page_count pages using only the standard library"""
+    lines = report_lines(page_count * lines_per_page, seed)
+    # Object 1: catalog, 2: page tree, 3: font, then (page, content) pairs
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(page_count):
+        page_lines = lines[page * lines_per_page:(page + 1) * lines_per_page]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(
+            f"({_pdf_escape(line)}) '" for line in page_lines) + " ET"
+        stream = stream.encode('latin-1')
+        content_id = len(objects) + 2
+        page_ids.append(len(objects) + 1)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def make_txt(line_count, seed=0):
+    """Build a plain-text report of line_count lines"""
+    return '\n'.join(report_lines(line_count, seed)).encode('utf-8')
+
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def _docx_paragraph(text):
+    from xml.sax.saxutils import escape
+
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def make_docx(line_count, seed=0, table_every=40):
+    """Build a DOCX of line_count paragraphs using only the standard library
+
+    Every table_every lines a lab results table (analyte, value, reference
+    range without parentheses) is inserted, as exported by lab systems.
+    """
+    import io
+    import zipfile
+
+    rng = random.Random(seed)
+    body = []
+    for index, line in enumerate(report_lines(line_count, seed)):
+        body.append(_docx_paragraph(line))
+        if table_every and index % table_every == table_every - 1:
+            rows = []
+            for lab in rng.sample(LAB_LINES, 4):
+                value_at = next(index for index, char in enumerate(lab) if char.isdigit())
+                value, _, reference = lab[value_at:].rpartition(' ')
+                reference = reference.strip('()')
+                name = lab[:value_at].strip()
+                cells = ''.join(f'<w:tc>{_docx_paragraph(cell)}</w:tc>' for cell in (name, value, reference))
+                rows.append(f'<w:tr>{cells}</w:tr>')
+            body.append(f'<w:tbl>{"".join(rows)}</w:tbl>')
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    buffered = io.BytesIO()
+    with zipfile.ZipFile(buffered, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _DOCX_RELS)
+        archive.writestr('word/document.xml', document)
+    return buffered.getvalue()
+
+
+def make_ccd(section_count, rows_per_section=20, seed=0):
+    """Build a namespaced HL7 CDA/CCD document with narrative tables in every section"""
+    rng = random.Random(seed)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<ClinicalDocument xmlns="urn:hl7-org:v3">',
+        '<recordTarget><patientRole><id extension="00482913"/>',
+        '<patient><name><given>Jane</given><family>Doe</family></name></patient>',
+        '</patientRole></recordTarget>',
+        '<component><structuredBody>',
+    ]
+    for index in range(section_count):
+        rows = ''.join(
+            f'<tr><td>{rng.choice(LAB_LINES)}</td><td>{rng.choice(SENTENCES)}</td></tr>'
+            for _ in range(rows_per_section))
+        parts.append(
+            f'<component><section><code code="{30954 + index}-2"/>'
+            f'<title>{rng.choice(SECTION_TITLES)}</title>'
+            f'<text><paragraph>{rng.choice(SENTENCES)}</paragraph><table><tbody>{rows}</tbody></table></text>'
+            f'<entry><observation><value value="{rng.uniform(1, 200):.1f}"/></observation></entry>'
+            '</section></component>')
+    parts.append('</structuredBody></component></ClinicalDocument>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def make_nested_xml(depth, breadth=3, seed=0):
+    """Build a generic (non-CDA) XML tree of the given depth and fan-out"""
+    rng = random.Random(seed)
+
+    def node(level):
+        if level == depth:
+            return f'<value>{rng.choice(LAB_LINES)}</value>'
+        children = ''.join(node(level + 1) for _ in range(breadth))
+        return f'<group><label>{rng.choice(SECTION_TITLES)}</label>{children}</group>'
+
+    return ('<?xml version="1.0"?><report>' + node(0) + '</report>').encode('utf-8')
+
+
+def make_scan_image(width, height, seed=0, mode='L'):
+    """Build a noisy synthetic radiograph-like image as PNG bytes"""
+    import io
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 40).convert('L')
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randint(min(width, height) // 20, min(width, height) // 6)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=rng.randint(120, 230))
+    image = image.filter(ImageFilter.GaussianBlur(2)).convert(mode)
+    buffered = io.BytesIO()
+    image.save(buffered, format='PNG')
+    return buffered.getvalue()
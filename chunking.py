@@ -0,0 +1,70 @@
+import re
+
+# Rough English average for GPT/Llama tokenizers; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Report headings survive preprocess_text as upper-case labels followed by a colon
+# (e.g. "HISTORY OF PRESENT ILLNESS:"), even once newlines have been collapsed
+HEADING_PATTERN = re.compile(r'\b[A-Z][A-Z/&]{2,}(?: [A-Z/&]+){0,6}:')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    """Approximate the number of model tokens in text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def split_sections(text):
+    """Split report text at section headings, keeping each heading with its body"""
+    starts = [match.start() for match in HEADING_PATTERN.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    return [text[start:end].strip() for start, end in zip(starts, starts[1:]) if text[start:end].strip()]
+
+
+def section_heading(section):
+    """Return the heading a section starts with, or None"""
+    match = HEADING_PATTERN.match(section)
+    return match.group(0)[:-1].strip() if match else None
+
+
+def _split_oversized(section, max_tokens):
+    """Split a section that exceeds the budget on sentence boundaries, hard-wrapping as a last resort"""
+    heading = section_heading(section)
+    prefix = f"{heading} (continued): " if heading else ""
+    max_chars = max(max_tokens * CHARS_PER_TOKEN - len(prefix), 1)
+
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(section):
+        sentences.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+
+    pieces, current = [], ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return [pieces[0]] + [prefix + piece for piece in pieces[1:]]
+
+
+def chunk_text(text, max_tokens):
+    """Pack report sections into chunks of at most max_tokens, in document order"""
+    chunks, current = [], ""
+    for section in split_sections(text):
+        if estimate_tokens(section) > max_tokens:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_oversized(section, max_tokens))
+        elif current and estimate_tokens(current) + estimate_tokens(section) > max_tokens:
+            chunks.append(current)
+            current = section
+        else:
+            current = f"{current} {section}" if current else section
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,94 @@
+from chunking import estimate_tokens
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a patient and a medical assistant "
+    "with the turns below. Keep the patient's questions, symptoms, reported values and the "
+    "advice given; drop pleasantries.\n\nCurrent summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+class Conversation:
+    """Chat history with per-message token counts and a bounded window for the model
+
+    Only the most recent messages within window_tokens (and window_turns
+    user/assistant pairs, if set) are sent to the model. Messages that fall
+    out of the window are folded into a rolling summary the next time the
+    window is built. At most max_messages are kept for display; older ones
+    are dropped once summarized.
+    """
+
+    def __init__(self, window_tokens=2000, window_turns=None, max_messages=500, summary_tokens=300):
+        self.window_tokens = window_tokens
+        self.window_turns = window_turns
+        self.max_messages = max_messages
+        self.summary_tokens = summary_tokens
+        self.messages = []  # {"role", "content", "tokens"} dicts, oldest first
+        self.summary = ""
+        self.dropped = 0  # messages no longer kept at all
+        self._window_start = 0  # index of the oldest message still in the window
+        self._summarized = 0  # messages before this index are in the summary
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, role, content):
+        """Add a message and slide the window past anything now over budget"""
+        self.messages.append({"role": role, "content": content, "tokens": estimate_tokens(content)})
+        window = self.messages[self._window_start:]
+        tokens = sum(message["tokens"] for message in window)
+        max_messages = 2 * self.window_turns if self.window_turns else None
+        # Always keep the newest message, however long
+        while len(window) > 1 and (tokens > self.window_tokens or (max_messages and len(window) > max_messages)):
+            tokens -= window.pop(0)["tokens"]
+            self._window_start += 1
+
+    def window(self):
+        """Return the messages currently sent to the model"""
+        return self.messages[self._window_start:]
+
+    def summarize(self, complete):
+        """Fold messages that left the window into the summary
+
+        complete(prompt, max_tokens) performs one model call and returns its text.
+        """
+        evicted = self.messages[self._summarized:self._window_start]
+        if not evicted:
+            return
+        turns = "\n".join(f"{message['role']}: {message['content']}" for message in evicted)
+        self.summary = complete(SUMMARY_PROMPT.format(summary=self.summary or "(none)", turns=turns),
+                                self.summary_tokens)
+        self._summarized = self._window_start
+        self._trim()
+
+    def _trim(self):
+        # Only summarized messages can go, so the summary never loses anything
+        excess = min(len(self.messages) - self.max_messages, self._summarized)
+        if excess > 0:
+            del self.messages[:excess]
+            self.dropped += excess
+            self._window_start -= excess
+            self._summarized -= excess
+
+    def model_messages(self, complete=None):
+        """Return the chat messages to send before a new question: the summary, then the window
+
+        With complete, messages that left the window are summarized first.
+        """
+        if complete is not None:
+            self.summarize(complete)
+        messages = [{"role": message["role"], "content": message["content"]} for message in self.window()]
+        if self.summary:
+            messages.insert(0, {"role": "user", "content": f"Summary of our earlier conversation: {self.summary}"})
+        return messages
+
+    def recent(self, count):
+        """Return the last count messages, for display"""
+        return self.messages[-count:] if count > 0 else []
+
+    def clear(self):
+        """Forget every message and the summary"""
+        self.messages.clear()
+        self.summary = ""
+        self.dropped = 0
+        self._window_start = 0
+        self._summarized = 0
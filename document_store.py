@@ -0,0 +1,157 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+
+def estimate_size(value, _seen=None):
+    """Approximate bytes held by value: strings, NumPy arrays, containers and slotted objects"""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(value)
+    if hasattr(value, 'nbytes') and hasattr(value, 'dtype'):
+        return sys.getsizeof(value) + (value.nbytes if value.base is None else 0)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        return size + sum(estimate_size(key, seen) + estimate_size(item, seen) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, seen) for item in value)
+    for slot in getattr(type(value), '__slots__', ()):
+        if hasattr(value, slot):
+            size += estimate_size(getattr(value, slot), seen)
+    if hasattr(value, '__dict__'):
+        size += estimate_size(vars(value), seen)
+    return size
+
+
+class Handle:
+    """A session's reference to a store entry; the reference is released when the handle is garbage collected"""
+
+    __slots__ = ('key', '_store', '_release', '__weakref__')
+
+    def __init__(self, store, key):
+        self.key = key
+        self._store = store
+        self._release = weakref.finalize(self, store.release, key)
+
+    @property
+    def value(self):
+        return self._store.get(self.key)
+
+    def release(self):
+        """Drop the reference now instead of waiting for garbage collection"""
+        self._release()
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'refs')
+
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.refs = 0
+
+
+class DocumentStore:
+    """Process-wide content-addressed store of extracted documents shared by every session
+
+    Sessions keep a Handle (the content hash) instead of their own copy, so a
+    document opened in N sessions is parsed once and held once. Entries that
+    no handle refers to are evicted least recently used first once the store
+    holds more than max_bytes; referenced entries are never evicted.
+    """
+
+    def __init__(self, max_bytes=512 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}  # key -> lock held while one session builds that entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the value stored under key, or None if it is not (or no longer) stored"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def acquire(self, key, build):
+        """Return a Handle to the value under key, calling build() to create it on a miss
+
+        Concurrent sessions acquiring the same missing key wait for a single build.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._reference(key)
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._reference(key)
+            try:
+                value = build()
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            size = estimate_size(value)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(value, size)
+                self.bytes += size
+                handle = self._reference(key)
+                self._evict()
+            return handle
+
+    def _reference(self, key):
+        self._entries[key].refs += 1
+        self._entries.move_to_end(key)
+        return Handle(self, key)
+
+    def release(self, key):
+        """Drop one reference to key, making it evictable once none remain"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                self._evict()
+
+    def _evict(self):
+        if self.bytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if not entry.refs]:
+            self.bytes -= self._entries.pop(key).size
+            if self.bytes <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Entry count, bytes held, referenced entries and hit/miss counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "referenced": sum(1 for entry in self._entries.values() if entry.refs),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        """Drop every entry no session refers to"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.refs]:
+                self.bytes -= self._entries.pop(key).size
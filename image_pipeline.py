@@ -0,0 +1,91 @@
+import base64
+import hashlib
+import io
+from collections import namedtuple
+
+# Vision models fit "high" detail images into 2048x2048 and then scale the
+# shortest side to 768px, and "low" detail into 512x512. Anything larger is
+# downscaled server-side, so sending it only costs upload bytes and encode time.
+ImagePolicy = namedtuple(
+    'ImagePolicy',
+    'detail max_side short_side quality tile tile_size',
+    defaults=("high", 2048, 768, 85, False, 768),
+)
+
+
+def policy_from_settings(settings):
+    """Build an ImagePolicy from a settings mapping such as st.secrets["image"]"""
+    return ImagePolicy(**{field: settings[field.upper()] for field in ImagePolicy._fields if field.upper() in settings})
+
+
+def payload_key(data, policy):
+    """Identify the encoded payload of image bytes under a policy"""
+    return hashlib.sha256(data).hexdigest() + '-' + hashlib.sha256(repr(policy).encode()).hexdigest()[:12]
+
+
+def normalize_mode(image):
+    """Convert an image to a mode JPEG can encode, keeping grayscale scans single-channel"""
+    from PIL import Image
+
+    if image.mode in ('I', 'I;16', 'I;16B', 'I;16L'):
+        # 16-bit scans (common for X-ray PNGs): scale down to 8 bits
+        return image.convert('I').point(lambda value: value / 256).convert('L')
+    if image.mode in ('L', 'RGB'):
+        return image
+    if image.mode in ('LA', 'RGBA', 'P', 'PA'):
+        # Flatten transparency onto white rather than the black JPEG would give
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def target_size(width, height, policy):
+    """Return the largest size the model will actually look at for this policy"""
+    if policy.detail == "low":
+        scale = min(1.0, 512 / max(width, height))
+    else:
+        scale = min(1.0, policy.max_side / max(width, height), policy.short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _jpeg_part(image, policy):
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=policy.quality)
+    img_str = base64.b64encode(buffered.getvalue()).decode('ascii')
+    return {
+        "type": "image_url",
+        "image_url": {"url": f"data:image/jpeg;base64,{img_str}", "detail": policy.detail},
+    }
+
+
+def _tiles(image, tile_size):
+    width, height = image.size
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            yield image.crop((left, top, min(left + tile_size, width), min(top + tile_size, height)))
+
+
+def encode_image(data, policy=ImagePolicy()):
+    """Decode image bytes once and return the image_url content parts to send to the model
+
+    The first part is the whole image downscaled to the model's effective
+    resolution. With policy.tile, scans larger than that are also sent as
+    full-resolution tiles (up to the max_side fit) so fine detail survives.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as opened:
+        image = normalize_mode(ImageOps.exif_transpose(opened))
+        image.load()
+
+    size = target_size(*image.size, policy)
+    overview = image.resize(size, Image.LANCZOS, reducing_gap=3.0) if size != image.size else image
+    parts = [_jpeg_part(overview, policy)]
+
+    if policy.tile and policy.detail != "low" and overview.size != image.size:
+        scale = min(1.0, policy.max_side / max(image.size))
+        detailed = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+        parts.extend(_jpeg_part(tile, policy) for tile in _tiles(detailed, policy.tile_size))
+    return parts
@@ -0,0 +1,79 @@
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+Job = namedtuple('Job', 'id owner session kind label status result error created started finished')
+
+
+class JobQueue:
+    """Runs analyses on a thread pool and records every job in a SQLite table
+
+    A job's status and result text live in the table rather than in the
+    Streamlit script, so reruns (or a different session) can poll for them
+    while the script thread stays free. Every row records the owner that
+    ran it; on start-up, jobs this owner left queued or running when its
+    previous process stopped are marked failed. Processes sharing one table
+    need distinct owners (the host name by default).
+    """
+
+    def __init__(self, path="jobs.sqlite3", max_workers=4, keep_seconds=86400, owner=None):
+        self.keep_seconds = keep_seconds
+        self.owner = owner or socket.gethostname()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, owner TEXT NOT NULL, session TEXT NOT NULL, kind TEXT NOT NULL, "
+                "label TEXT NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session, created)")
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE owner = ? AND status IN (?, ?)",
+                (FAILED, "Interrupted by a restart", time.time(), self.owner, QUEUED, RUNNING),
+            )
+
+    def submit(self, session, kind, func, *args, label=None, **kwargs):
+        """Queue func(*args, **kwargs), whose return value is the job's result text; returns the job id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM jobs WHERE finished < ?", (now - self.keep_seconds,)
+            )
+            self._connection.execute(
+                "INSERT INTO jobs (id, owner, session, kind, label, status, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, self.owner, session, kind, label or kind, QUEUED, now),
+            )
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connection:
+            self._connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status=RUNNING, started=time.time())
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished=time.time())
+        else:
+            self._update(job_id, status=DONE, result=result, finished=time.time())
+
+    def get(self, job_id):
+        """Return the Job with job_id, or None"""
+        with self._lock:
+            row = self._connection.execute(f"SELECT {', '.join(Job._fields)} FROM jobs WHERE id = ?",
+                                           (job_id,)).fetchone()
+        return Job(*row) if row else None
@@ -0,0 +1,232 @@
+import re
+
+from retrieval import tokenize
+
+_NUMBER = r'\d+(?:\.\d+)?'
+
+# "Hemoglobin 11.2 g/dL (13.5-17.5)", "WBC: 12.4 x10^9/L [4.0 - 11.0]",
+# "LDL 162 mg/dL (ref <100)", or a table row "Ferritin 8 ng/mL 15-150". The
+# analyte starts with a capital (or is "eGFR"-style); words of the sentence
+# before it that the match picks up ("Labs today show Hemoglobin") are
+# trimmed by _trim_analyte.
+LAB_PATTERN = re.compile(
+    r"(?P<analyte>(?:[A-Z]|[a-z](?=[A-Z]))[A-Za-z0-9'/-]*(?: (?:[A-Za-z0-9'/-]+|\([A-Za-z0-9]+\))){0,4}?)"
+    rf"\s*:?\s*(?P<qualifier>[<>]=?)?\s*(?P<value>{_NUMBER})"
+    r"(?:\s*(?P<unit>(?:x ?)?10\^\d+/[A-Za-zµ]+|%|[A-Za-zµ][A-Za-zµ]*(?:/[A-Za-zµ0-9]+)?))?"
+    r"(?:\s*[(\[]\s*(?:(?i:ref(?:erence)?(?: range)?|normal)\s*:?\s*)?"
+    rf"(?:(?P<low>{_NUMBER})\s*(?:-|–|to)\s*(?P<high>{_NUMBER})|(?P<bound>[<>]=?)\s*(?P<limit>{_NUMBER}))"
+    r"\s*[)\]]"
+    # A bare range after the value, as in a table row ("Sodium 130 mmol/L 135-145");
+    # not part of a longer number or date, and not followed by a lower-case word ("1-2 tablets")
+    rf"|\s+(?P<bare_low>{_NUMBER})\s*[-–]\s*(?P<bare_high>{_NUMBER})(?![\d.\-–/])(?!\s*[a-z]))?"
+)
+
+# Spellings that reports use for the same analyte
+ALIASES = {
+    "hgb": "hemoglobin", "hb": "hemoglobin", "haemoglobin": "hemoglobin",
+    "wbc": "white blood cell count", "white blood cells": "white blood cell count",
+    "white cell count": "white blood cell count", "leukocytes": "white blood cell count",
+    "rbc": "red blood cell count", "red blood cells": "red blood cell count",
+    "plt": "platelets", "platelet count": "platelets",
+    "hct": "hematocrit", "haematocrit": "hematocrit",
+    "na": "sodium", "k": "potassium", "cl": "chloride",
+    "cr": "creatinine", "creat": "creatinine", "bun": "blood urea nitrogen", "urea": "blood urea nitrogen",
+    "glu": "glucose", "blood glucose": "glucose", "fasting glucose": "glucose",
+    "hba1c": "hemoglobin a1c", "a1c": "hemoglobin a1c",
+    "ldl": "ldl cholesterol", "ldl-c": "ldl cholesterol", "hdl": "hdl cholesterol", "hdl-c": "hdl cholesterol",
+    "tsh": "thyroid stimulating hormone", "alt": "alanine aminotransferase", "ast": "aspartate aminotransferase",
+    "crp": "c-reactive protein", "egfr": "estimated gfr",
+}
+KNOWN_ANALYTES = frozenset(ALIASES.values())
+# Aliases this short are ordinary words or letters in a question ("vitamin K",
+# "Na" in a name), so questions are only matched on the longer spellings
+_SHORT_ALIAS_LENGTH = 2
+_ALIASES_OF = {}
+for _alias, _analyte in ALIASES.items():
+    if len(_alias) > _SHORT_ALIAS_LENGTH:
+        _ALIASES_OF.setdefault(_analyte, []).append(_alias)
+
+# Sentence words that end the text before an analyte name ("Labs today show Hemoglobin")
+_LEAD_WORDS = frozenset({
+    "a", "an", "and", "are", "at", "checked", "drawn", "for", "had", "has", "have", "her", "his", "in", "is",
+    "lab", "labs", "measured", "noted", "of", "on", "repeat", "result", "results", "reveal", "revealed",
+    "reveals", "show", "showed", "shows", "the", "their", "today", "was", "were", "with", "yesterday",
+})
+
+# Words dropped when matching a question to an analyte name
+_GENERIC_TERMS = frozenset({"count", "level", "levels", "serum", "plasma", "total"})
+_STATUS_TERMS = frozenset({"low", "high", "normal", "abnormal", "elevated", "range", "ok", "okay", "fine", "bad"})
+_STATUS_LABELS = {-1: "below", 0: "within", 1: "above"}
+
+
+def canonical_analyte(name):
+    """Normalise an analyte name for indexing: lower case, single spaces, aliases resolved"""
+    key = ' '.join(name.lower().replace(',', ' ').split())
+    return ALIASES.get(key, key)
+
+
+def _stem(term):
+    return term[:-1] if len(term) > 3 and term.endswith('s') else term
+
+
+def _terms(name):
+    return frozenset(_stem(term) for term in tokenize(name) if term not in _GENERIC_TERMS)
+
+
+def _question_terms(key):
+    """Term sets of an analyte name and its question aliases; a question must contain all of one"""
+    return [terms for terms in map(_terms, [key, *_ALIASES_OF.get(key, ())]) if terms]
+
+
+_KNOWN_TERMS = {analyte: _question_terms(analyte) for analyte in KNOWN_ANALYTES}
+
+
+def _trim_analyte(analyte):
+    """Drop sentence words picked up before an analyte name
+
+    Keeps the longest trailing run of words that is a known analyte, or
+    else the words after the last sentence word.
+    """
+    words = analyte.split()
+    if len(words) == 1:
+        return analyte
+    for start in range(len(words)):
+        if canonical_analyte(' '.join(words[start:])) in KNOWN_ANALYTES:
+            return ' '.join(words[start:])
+    for start in range(len(words) - 1, 0, -1):
+        if words[start - 1].lower() in _LEAD_WORDS:
+            return ' '.join(words[start:])
+    return analyte
+
+
+class LabTable:
+    """Columnar table of the lab results in one report, indexed by analyte
+
+    Values and reference limits are NumPy float arrays (NaN where a limit
+    is missing), so out-of-range flags are computed for every row at once.
+    """
+
+    __slots__ = ('analytes', 'units', 'values', 'low', 'high', 'status', '_index', '_terms')
+
+    def __init__(self, rows=()):
+        import numpy as np
+
+        rows = list(rows)
+        self.analytes = [row[0] for row in rows]
+        self.units = [row[2] or '' for row in rows]
+        self.values = np.array([row[1] for row in rows], dtype=np.float64)
+        self.low = np.array([row[3] for row in rows], dtype=np.float64)
+        self.high = np.array([row[4] for row in rows], dtype=np.float64)
+        # -1 below range, 0 within (or no range given), 1 above; NaN compares False
+        self.status = (self.values > self.high).astype(np.int8) - (self.values < self.low).astype(np.int8)
+
+        index = {}
+        for row_id, analyte in enumerate(self.analytes):
+            index.setdefault(canonical_analyte(analyte), []).append(row_id)
+        self._index = {key: np.array(row_ids, dtype=np.int32) for key, row_ids in index.items()}
+        # A question mentions an analyte if it contains every term of its name or of an alias
+        self._terms = {key: _question_terms(key) for key in self._index}
+
+    @classmethod
+    def from_text(cls, text):
+        """Extract every lab result with a reference range, or with a well-known analyte name"""
+        rows = []
+        for match in LAB_PATTERN.finditer(text):
+            analyte = _trim_analyte(match.group('analyte').strip())
+            low, high = match.group('low'), match.group('high')
+            if match.group('bare_low') and float(match.group('bare_low')) <= float(match.group('bare_high')):
+                low, high = match.group('bare_low'), match.group('bare_high')
+            bound = match.group('bound')
+            if bound:
+                low, high = (match.group('limit'), None) if bound.startswith('>') else (None, match.group('limit'))
+            elif low is None and canonical_analyte(analyte) not in KNOWN_ANALYTES:
+                continue
+            rows.append((
+                analyte,
+                float(match.group('value')),
+                match.group('unit'),
+                float(low) if low is not None else float('nan'),
+                float(high) if high is not None else float('nan'),
+            ))
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.analytes)
+
+    def abnormal(self):
+        """Return the row ids of values outside their reference range"""
+        import numpy as np
+
+        return np.flatnonzero(self.status)
+
+    def find(self, question):
+        """Return the row ids of the analytes a question mentions, in report order"""
+        import numpy as np
+
+        asked = frozenset(_stem(term) for term in tokenize(question))
+        matched = [row_ids for key, row_ids in self._index.items()
+                   if any(terms <= asked for terms in self._terms[key])]
+        return np.sort(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int32)
+
+    def reference(self, row_id):
+        """The reference range of a row as written ("13.5-17.5", "<100"), or None if the report gave none"""
+        low, high = self.low[row_id], self.high[row_id]
+        if low == low and high == high:  # NaN != NaN
+            return f"{low:g}-{high:g}"
+        if low == low:
+            return f">{low:g}"
+        if high == high:
+            return f"<{high:g}"
+        return None
+
+    def describe(self, row_id):
+        """One line for a row: value, unit, reference range and whether it is out of range"""
+        unit = f" {self.units[row_id]}" if self.units[row_id] else ""
+        reference = self.reference(row_id)
+        if reference is None:
+            return f"{self.analytes[row_id]}: {self.values[row_id]:g}{unit} (no reference range given)"
+        flag = {-1: " LOW", 1: " HIGH"}.get(int(self.status[row_id]), "")
+        return f"{self.analytes[row_id]}: {self.values[row_id]:g}{unit} (reference {reference}){flag}"
+
+    def context(self, row_ids, title="Lab results extracted from the report"):
+        """Format rows for a prompt, one line per distinct result"""
+        lines = dict.fromkeys(f"- {self.describe(row_id)}" for row_id in row_ids)
+        return f"{title}:\n" + "\n".join(lines)
+
+    def findings(self):
+        """Format the out-of-range values for an analysis prompt, or "" if there are none"""
+        abnormal = self.abnormal()
+        return self.context(abnormal, "Lab values outside their reference range") if len(abnormal) else ""
+
+    def answer(self, question):
+        """Answer "is my X low/high/normal?" from the table, or return None if the model is needed
+
+        Questions that also name a well-known analyte missing from the table
+        ("is my hemoglobin A1c high?" with only hemoglobin) go to the model.
+        """
+        row_ids = self.find(question)
+        if not len(row_ids) or not set(tokenize(question)) & _STATUS_TERMS:
+            return None
+        asked = frozenset(_stem(term) for term in tokenize(question))
+        present = {terms for key_terms in self._terms.values() for terms in key_terms}
+        for known in _KNOWN_TERMS.values():
+            if any(terms <= asked for terms in known) and not any(terms in present for terms in known):
+                return None
+        lines = {}
+        for row_id in row_ids:
+            reference = self.reference(row_id)
+            if reference is None:
+                return None  # nothing to compare against; let the model explain
+            unit = f" {self.units[row_id]}" if self.units[row_id] else ""
+            status = _STATUS_LABELS[int(self.status[row_id])]
+            lines[f"- {self.analytes[row_id]}: {self.values[row_id]:g}{unit}, "
+                  f"{status} the reference range ({reference}{unit})."] = None
+        return "From the lab results in your report:\n" + "\n".join(lines)
+
+    def records(self):
+        """Return the rows as dicts, for display"""
+        return [
+            {"analyte": self.analytes[i], "value": float(self.values[i]), "unit": self.units[i],
+             "low": float(self.low[i]), "high": float(self.high[i]), "flag": {-1: "low", 1: "high"}.get(int(self.status[i]), "")}
+            for i in range(len(self))
+        ]
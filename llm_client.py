@@ -0,0 +1,282 @@
+import asyncio
+import queue
+import random
+import threading
+
+from chunking import CHARS_PER_TOKEN
+from rate_limit import TokenBucket
+
+# 408/409 are returned by Azure for request timeouts and lock contention
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+_DONE = object()
+
+
+def is_transient(error):
+    """Return True for failures worth retrying: timeouts, dropped connections, 429 and 5xx"""
+    import httpx
+
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if getattr(error, "status_code", None) in TRANSIENT_STATUS:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_delay(error, attempt, base=0.5, cap=30.0):
+    """Seconds to wait before retry number attempt: Retry-After if given, else full-jitter backoff"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(cap, float(retry_after))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def prompt_tokens(request):
+    """Estimate the prompt tokens of a chat request"""
+    prompt_chars = 0
+    for message in request.get("messages", []):
+        content = message["content"]
+        if isinstance(content, str):
+            prompt_chars += len(content)
+        else:
+            prompt_chars += sum(len(part.get("text", "")) for part in content)
+    return -(-prompt_chars // CHARS_PER_TOKEN)
+
+
+def request_tokens(request):
+    """Estimate the prompt plus completion tokens a chat request will consume"""
+    max_tokens = request.get("max_tokens") or request.get("max_completion_tokens") or 0
+    return prompt_tokens(request) + max_tokens
+
+
+def _count(stats, name, amount=1):
+    if stats is not None:
+        stats[name] = stats.get(name, 0) + amount
+
+
+def options_from_settings(settings):
+    """Map a settings mapping such as st.secrets["llm"] to LLMProvider keyword arguments"""
+    names = {
+        "MAX_CONNECTIONS": "max_connections",
+        "MAX_CONCURRENCY": "max_concurrency",
+        "REQUESTS_PER_MINUTE": "requests_per_minute",
+        "TOKENS_PER_MINUTE": "tokens_per_minute",
+        "MAX_RETRIES": "max_retries",
+        "TIMEOUT_SECONDS": "timeout",
+        "HEDGE_AFTER_SECONDS": "hedge_after",
+    }
+    return {option: settings[name] for name, option in names.items() if name in settings}
+
+
+def pooled_http_client(max_connections=20, timeout=60.0):
+    """Shared keep-alive connection pool for one provider"""
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+
+
+class LLMProvider:
+    """Async chat completions over Azure OpenAI, Groq or any OpenAI-compatible server
+
+    Requests share one pooled HTTP client, are admitted by requests/min and
+    tokens/min buckets and a concurrency cap, time out after timeout seconds
+    (streams from the request to the last delta), and are retried on
+    transient errors with jittered backoff. With hedge_after set, a
+    non-streaming call still running after that many seconds gets a
+    duplicate request and the first answer wins.
+
+    The coroutine API must be used from a single event loop. Synchronous
+    callers (Streamlit, thread pools) use complete_sync/stream_sync, which run
+    on a background loop owned by the provider.
+
+    Every call accepts a stats dict, which is updated with the retries,
+    hedges and rate-limit wait (throttled_s) of that call.
+    """
+
+    def __init__(self, client, max_concurrency=16, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=4, timeout=60.0, hedge_after=None):
+        self.client = client
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+
+    @classmethod
+    def azure(cls, endpoint, api_key, api_version, max_connections=20, timeout=60.0, **options):
+        """Provider for an Azure OpenAI resource"""
+        from openai import AsyncAzureOpenAI
+
+        client = AsyncAzureOpenAI(
+            azure_endpoint=endpoint,
+            api_key=api_key,
+            api_version=api_version,
+            max_retries=0,
+            http_client=pooled_http_client(max_connections, timeout),
+        )
+        return cls(client, timeout=timeout, **options)
+
+    @classmethod
+    def groq(cls, api_key, base_url=None, max_connections=20, timeout=60.0, **options):
+        """Provider for the Groq API"""
+        from groq import AsyncGroq
+
+        client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=pooled_http_client(max_connections, timeout),
+        )
+        return cls(client, timeout=timeout, **options)
+
+    @classmethod
+    def openai_compatible(cls, base_url, api_key="unused", max_connections=20, timeout=60.0, **options):
+        """Provider for any OpenAI-compatible endpoint, such as a local stub server"""
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            max_retries=0,
+            http_client=pooled_http_client(max_connections, timeout),
+        )
+        return cls(client, timeout=timeout, **options)
+
+    async def _throttle(self, request, stats=None):
+        wait = 0.0
+        if self._requests:
+            delay = self._requests.reserve(1)
+            wait += delay
+            await asyncio.sleep(delay)
+        if self._tokens:
+            delay = self._tokens.reserve(request_tokens(request))
+            wait += delay
+            await asyncio.sleep(delay)
+        _count(stats, "throttled_s", wait)
+
+    async def _attempt(self, request):
+        async with self._slots:
+            return await asyncio.wait_for(self.client.chat.completions.create(**request), self.timeout)
+
+    async def _hedged(self, request, stats=None):
+        primary = asyncio.ensure_future(self._attempt(request))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        _count(stats, "hedges")
+        pending = {primary, asyncio.ensure_future(self._attempt(request))}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return primary.result()  # both failed; surface the primary's error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, stats=None, **request):
+        """Run a chat completion and return the message text"""
+        request = {**request, "stream": False}
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(request, stats)
+            try:
+                completion = await (self._hedged(request, stats) if self.hedge_after else self._attempt(request))
+                return completion.choices[0].message.content
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                self.retries += 1
+                _count(stats, "retries")
+                await asyncio.sleep(retry_delay(e, attempt))
+
+    async def stream(self, stats=None, **request):
+        """Run a streamed chat completion, yielding text deltas
+
+        The timeout covers the whole stream, not just the first response, so
+        a server that stalls mid-answer cannot hold a slot indefinitely.
+        Failures are retried only until the first delta arrives; after that
+        a retry would repeat text the caller has already shown.
+        """
+        request = {**request, "stream": True}
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(request, stats)
+            started = False
+            try:
+                async with self._slots:
+                    deadline = loop.time() + self.timeout
+                    completion = await asyncio.wait_for(self.client.chat.completions.create(**request), self.timeout)
+                    chunks = completion.__aiter__()
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                            except StopAsyncIteration:
+                                break
+                            # Azure sends a leading chunk with no choices (content filter results)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                started = True
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        await completion.close()
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not is_transient(e):
+                    raise
+                self.retries += 1
+                _count(stats, "retries")
+                await asyncio.sleep(retry_delay(e, attempt))
+
+    def _background_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-provider", daemon=True).start()
+            return self._loop
+
+    def complete_sync(self, **request):
+        """Blocking complete() for synchronous callers"""
+        return asyncio.run_coroutine_threadsafe(self.complete(**request), self._background_loop()).result()
+
+    def stream_sync(self, **request):
+        """Blocking iterator over stream() deltas for synchronous callers"""
+        deltas = queue.Queue()
+
+        async def pump():
+            try:
+                async for delta in self.stream(**request):
+                    deltas.put(delta)
+            except Exception as e:
+                deltas.put(e)
+            finally:
+                deltas.put(_DONE)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._background_loop())
+        try:
+            while (item := deltas.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        """Close the connection pool and stop the background loop"""
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
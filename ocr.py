@@ -0,0 +1,61 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from report_cache import ExtractionCache, content_key
+
+# pytesseract runs each call in its own tesseract process, so a thread pool of
+# this size bounds the number of concurrent OCR processes without pickling images
+OCR_MAX_WORKERS = 4
+
+# Per-page OCR results, keyed on the hash of the page's image bytes
+page_cache = ExtractionCache(max_entries=512)
+
+
+def ocr_available():
+    """Return True if the tesseract binary can be found"""
+    # pytesseract pulls in pandas when installed, so import it only when OCR is needed
+    import pytesseract
+
+    try:
+        pytesseract.get_tesseract_version()
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return False
+    return True
+
+
+def page_images(page):
+    """Return the encoded images embedded in a PDF page (the scan, for scanned reports)"""
+    try:
+        return [image.data for image in page.images]
+    except (KeyError, NotImplementedError, ValueError):
+        # Unsupported image filters or a page without resources; nothing to OCR
+        return []
+
+
+def ocr_image(data):
+    """Run OCR on a single encoded image"""
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return pytesseract.image_to_string(image.convert('L'))
+
+
+def _ocr_page(images):
+    return '\n'.join(ocr_image(data) for data in images)
+
+
+def ocr_pages(pages, workers=None, cache=None):
+    """OCR a list of pages, each given as a list of image bytes, returning one text per page"""
+    cache = cache if cache is not None else page_cache
+    keys = [content_key(b''.join(images), 'ocr') for images in pages]
+    texts = [cache.get(key) for key in keys]
+
+    pending = [index for index, text in enumerate(texts) if text is None and pages[index]]
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(workers or OCR_MAX_WORKERS, len(pending))) as executor:
+            for index, text in zip(pending, executor.map(_ocr_page, [pages[i] for i in pending])):
+                cache.put(keys[index], text)
+                texts[index] = text
+
+    return [text or '' for text in texts]
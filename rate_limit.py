@@ -0,0 +1,33 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Take amount tokens (clipped to capacity) and return how long to wait before using them"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            # A negative balance is debt that the refill rate pays off
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, amount=1):
+        """Block until amount tokens are available"""
+        delay = self.reserve(amount)
+        if delay:
+            time.sleep(delay)
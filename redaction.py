@@ -0,0 +1,260 @@
+import itertools
+import re
+
+REDACTED = '[REDACTED]'
+
+# Every pattern below matches fewer characters than this, so text more than
+# OVERLAP characters from the end of the buffer can be emitted without
+# waiting for the next chunk
+OVERLAP = 1024
+
+# Longest lookbehind in the patterns below; this much already-emitted text is
+# kept ahead of each chunk so matches at its start see what precedes them
+LOOKBEHIND = 8
+
+# Characters of an e-mail local part; see Redactor._safe_cut
+EMAIL_LOCAL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._+-')
+
+_SPACE_RUN = re.compile(' {2,}')
+
+# Capitalised words that follow a "Name:" label in lab reports but are not
+# part of a name
+DEMOGRAPHIC_WORDS = ('male', 'female', 'sex', 'gender', 'age', 'dob', 'mrn', 'date', 'unknown', 'none')
+# Test and analyte words. A name does not start with one, but a surname may
+# be one ("John White"), so these are only ruled out after the first word
+LAB_WORDS = (
+    'report', 'results', 'lab', 'labs', 'laboratory', 'test', 'tests', 'panel', 'profile', 'complete',
+    'comprehensive', 'basic', 'metabolic', 'blood', 'cell', 'cells', 'count', 'white', 'red', 'hemoglobin',
+    'haemoglobin', 'hematocrit', 'platelet', 'platelets', 'glucose', 'sodium', 'potassium', 'chloride', 'calcium',
+    'creatinine', 'urea', 'nitrogen', 'cholesterol', 'lipid', 'thyroid', 'urine', 'urinalysis', 'serum', 'plasma',
+    'vitamin',
+)
+NOT_NAME_WORDS = DEMOGRAPHIC_WORDS + LAB_WORDS
+
+
+def _not_words(words):
+    return '(?!(?i:' + '|'.join(words) + r')\b)'
+
+
+_WORD_SHAPE = r"[A-Z][A-Za-z'-]{1,40}\b"
+# A word directly followed by a measurement ("Jane Doe Troponin 0.02") is not
+# part of the name; an age ("Jane Doe 45") may follow one
+_NOT_MEASURED = r"(?![ \t]*(?:\d+[.,]\d|[(<>]))"
+_NAME_WORD = _not_words(NOT_NAME_WORDS) + _WORD_SHAPE
+_SURNAME = _not_words(DEMOGRAPHIC_WORDS) + _WORD_SHAPE + _NOT_MEASURED
+_INITIAL = r"[A-Z]\.?(?!\w)"
+# Stops before the next "Label:" on the line
+_NAME_GAP = r"[ \t]{1,4}(?!\w+:)"
+# "Jane Doe", "Jane Q. Doe", "Mary Ann Doe", "Doe, Jane", "Doe, Jane Q."; failing
+# those, the first word alone, so a name is never left whole after its label
+_PERSON = (rf"{_SURNAME},{_NAME_GAP}{_NAME_WORD}(?:{_NAME_GAP}(?:{_INITIAL}|{_NAME_WORD}{_NOT_MEASURED}))?"
+           rf"|{_NAME_WORD}{_NAME_GAP}(?:(?:{_INITIAL}|{_NAME_WORD}){_NAME_GAP})?{_SURNAME}"
+           rf"|{_NAME_WORD}")
+_DATE = r"(?:\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}|[A-Z][a-z]{2,8}\.?[ \t]\d{1,2},?[ \t]\d{4})"
+_RECORD_VALUE = r"\s{0,8}[A-Z0-9-]{0,20}\d[A-Z0-9-]{0,20}"
+
+# (group, first characters, rest of the match). The combined pattern starts
+# with a class of every possible first character, which lets the regex engine
+# skip all other positions in C; each rest re-checks which first character it
+# follows with a lookbehind. (?<!\w.) is a word boundary before that character.
+# Labels are recognised when they start with a capital ("MRN", "Mrn", not "mrn").
+IDENTIFIER_PATTERNS = [
+    # Spaces are not a first character: they are too common to test every one,
+    # so Redactor collapses runs of them in the text between matches instead
+    ('whitespace', r'\t\n\r\f\v', r'\s*'),
+    ('record_number', 'PMA',
+     r'(?<=P)(?<!\w.)(?i:atient[ \t]?id)\s{0,8}[:#]{0,2}' + _RECORD_VALUE +
+     r'|(?<=M)(?<!\w.)(?i:rn)\s{0,8}[:#]{0,2}' + _RECORD_VALUE +
+     r'|(?<=M)(?<!\w.)(?i:edical[ \t]record)(?:[ \t](?i:number|no\.?))?\s{0,8}[:#]{1,2}' + _RECORD_VALUE +
+     r'|(?<=A)(?<!\w.)(?i:ccount)(?:[ \t](?i:number|no\.?))?\s{0,8}[:#]{1,2}' + _RECORD_VALUE),
+    ('birth_date', 'DB',
+     rf'(?:(?<=D)(?<!\w.)(?i:ob|\.o\.b\.|ate[ \t]of[ \t]birth)|(?<=B)(?<!\w.)(?i:irth[ \t]?date))'
+     rf'\s{{0,8}}:?\s{{0,8}}{_DATE}'),
+    # "Patient:", "Patient Name:" or a bare "Name:", but not "Drug Name:"
+    ('labelled_name', 'PN',
+     rf'(?:(?<=P)(?<!\w.)(?i:atient(?:[ \t]name)?)|(?<=N)(?<!\w.)(?<![A-Za-z][ \t].)(?i:ame))'
+     rf'[ \t]{{0,8}}:[ \t]{{0,8}}(?P<person>{_PERSON})'),
+    ('titled_name', 'M', rf'(?<=M)(?<!\w.)(?:rs?|s|iss)\.?[ \t]{{1,4}}{_NAME_WORD}'),
+    ('ssn', '0-9', r'(?<=\d)(?<!\w.)\d\d-\d\d-\d{4}\b'),
+    ('phone', r'(+0-9',
+     r'(?<=\()(?<!\w.)\d{3}\)[ ]?\d{3}[ .-]\d{4}\b'
+     r'|(?<=\+)(?<!\w.)1[ .-]?(?:\(\d{3}\)[ ]?|\d{3}[ .-])\d{3}[ .-]\d{4}\b'
+     r'|(?<=\d)(?<!\w.)\d\d[ .-]\d{3}[ .-]\d{4}\b'),
+    # Matched from the "@"; Redactor also redacts the local part before it
+    ('email', '@', r'(?<=[\w.+-]@)[\w-]{1,63}(?:\.[\w-]{1,63}){1,4}\b'),
+]
+
+
+def _trie_branches(words):
+    """Compile literal words into one (first character, prefix-trie regex for the rest) per first character"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def walk(node):
+        branches = [(r'\s+' if char == ' ' else re.escape(char)) + walk(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return [(char, walk(child)) for char, child in sorted(trie.items())]
+
+
+def name_variants(name):
+    """Return the spellings of a name to redact: the full name and the surname, as written, upper and title case
+
+    Given names and initials on their own are left alone; they are too often
+    ordinary words.
+    """
+    if ',' in name:
+        last, _, rest = name.partition(',')
+        given = [part for part in rest.split() if len(part.strip('.')) > 1]
+        # "Doe, Jane" is also written "Jane Doe" in the narrative
+        variants = {' '.join(name.replace(',', ' ').split()), ' '.join(given[:1] + last.split())}
+    else:
+        parts = name.split()
+        given = [part for part in parts[:-1] if len(part.strip('.')) > 1]
+        last = parts[-1]
+        variants = {' '.join(parts), ' '.join(given[:1] + [last])}
+    if last.strip().lower() not in NOT_NAME_WORDS:
+        variants.add(last.strip())
+    return variants | {variant.upper() for variant in variants} | {variant.title() for variant in variants}
+
+
+def compile_pattern(names=()):
+    """Compile every identifier pattern, plus a dictionary of names, into one regex"""
+    first_chars = ''.join(first for _, first, _ in IDENTIFIER_PATTERNS)
+    # The empty group closing each alternative names it in match.lastgroup
+    alternatives = [f'(?:(?<=[{first}])(?:{rest}))(?P<{group}>)' for group, first, rest in IDENTIFIER_PATTERNS]
+    if names:
+        branches = _trie_branches(names)
+        first_chars += ''.join(re.escape(char) for char, _ in branches)
+        alternatives.append(r'(?<!\w.)(?:' + '|'.join(
+            rf'(?<={re.escape(char)}){rest}\b' for char, rest in branches) + ')(?P<known_name>)')
+    return re.compile(f'[{first_chars}](?:' + '|'.join(alternatives) + ')')
+
+
+class Redactor:
+    """Collapses whitespace and redacts identifiers in one regex scan
+
+    Record numbers, dates of birth, names, SSNs, phone numbers, e-mail
+    addresses and a dictionary of known names are compiled into a single
+    pattern. Names found after a "Patient:" or "Name:" label are added to
+    the dictionary for the rest of the document.
+    """
+
+    def __init__(self, names=(), learn_names=True, replacement=REDACTED):
+        self.names = set().union(*map(name_variants, names)) if names else set()
+        self.learn_names = learn_names
+        self.replacement = replacement
+        self.overlap = max([OVERLAP] + [2 * len(name) for name in self.names])
+        self._pattern = None
+
+    @property
+    def pattern(self):
+        """The combined pattern for the configured names, compiled on first use"""
+        if self._pattern is None:
+            self._pattern = compile_pattern(self.names)
+        return self._pattern
+
+    @staticmethod
+    def _email_start(buffer, at, floor):
+        """Return where the local part ending at buffer[at] (the "@") begins, not before floor"""
+        start = at
+        while start > floor and at - start < 64 and buffer[start - 1] in EMAIL_LOCAL_CHARS:
+            start -= 1
+        return start
+
+    @classmethod
+    def _safe_cut(cls, buffer, at, floor):
+        """Move a chunk boundary back out of a run of spaces or a word (perhaps an e-mail local part)"""
+        if at > floor and buffer[at - 1] == ' ':
+            return len(buffer[floor:at].rstrip(' ')) + floor
+        return cls._email_start(buffer, at, floor)
+
+    def redact_chunks(self, chunks):
+        """Yield the cleaned text of a stream of text chunks, as if they were one string
+
+        Matches never straddle a yielded boundary: up to overlap characters of
+        each chunk are held back until the next one shows how they end, and
+        the last LOOKBEHIND emitted characters are rescanned as context only.
+        """
+        pattern = self.pattern
+        learned = set()
+        pending = ''
+        emitted = 0
+        at_start = True
+        for chunk in itertools.chain(chunks, [None]):
+            final = chunk is None
+            buffer = pending + (chunk or '')
+            limit = len(buffer) if final else len(buffer) - self.overlap
+            out = []
+            pos = emitted
+            rescan = True
+            while rescan:
+                rescan = False
+                for match in pattern.finditer(buffer, pos):
+                    start = match.start()
+                    if start >= limit:
+                        break
+                    kind = match.lastgroup
+                    if kind == 'email':
+                        start = self._email_start(buffer, start, pos)
+                    if not final and match.end() > limit:
+                        # The match could still grow with the next chunk
+                        limit = start
+                        break
+
+                    literal = buffer[pos:start]
+                    if '  ' in literal:
+                        literal = _SPACE_RUN.sub(' ', literal)
+                    if kind == 'whitespace':
+                        out.append(literal.rstrip(' '))
+                        out.append(' ')
+                    else:
+                        out.append(literal)
+                        out.append(self.replacement)
+                    pos = match.end()
+                    # A lone word after the label may be a given name only; it is not learned
+                    if kind == 'labelled_name' and self.learn_names and len(match.group('person').split()) > 1:
+                        new_names = name_variants(match.group('person')) - self.names - learned
+                        if new_names:
+                            learned |= new_names
+                            pattern = compile_pattern(self.names | learned)
+                            rescan = True
+                            break
+
+            cut = limit if final else self._safe_cut(buffer, limit, pos)
+            if pos < cut:
+                literal = buffer[pos:cut]
+                out.append(_SPACE_RUN.sub(' ', literal) if '  ' in literal else literal)
+                pos = cut
+            keep = max(pos - LOOKBEHIND, 0)
+            pending = buffer[keep:]
+            emitted = pos - keep
+            text = ''.join(out)
+            if at_start:
+                text = text.lstrip()
+            if final:
+                # Trailing whitespace is always within the held-back tail
+                text = text.rstrip()
+            if text:
+                at_start = False
+                yield text
+
+    def redact(self, text):
+        """Return text with whitespace collapsed and identifiers redacted"""
+        return ''.join(self.redact_chunks([text]))
+
+
+default_redactor = Redactor()
+
+
+def redact(text):
+    """Clean text with the default Redactor"""
+    return default_redactor.redact(text)
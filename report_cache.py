@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Bump whenever read_file/preprocess_text change their output so stale
+# entries (in memory or on disk) are never served for a new parser.
+PARSER_VERSION = "6"
+
+
+def content_key(data, file_type, parser_version=PARSER_VERSION):
+    """Build a cache key from the uploaded bytes, their type and the parser version"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{parser_version}-{file_type}-{digest}"
+
+
+class ExtractionCache:
+    """In-memory LRU cache of extracted report text with an optional on-disk tier
+
+    Without cache_dir it can hold arbitrary Python objects, which is how
+    derived per-report structures such as retrieval indexes are cached.
+    """
+
+    def __init__(self, max_entries=32, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as file:
+                    text = file.read()
+            except FileNotFoundError:
+                return None
+            self._remember(key, text)
+            return text
+        return None
+
+    def put(self, key, text):
+        """Store text under key in memory and, if configured, on disk"""
+        self._remember(key, text)
+        if self.cache_dir:
+            # Write to a temp name first so concurrent readers never see a partial file
+            temp_path = f"{self._disk_path(key)}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.write(text)
+            os.replace(temp_path, self._disk_path(key))
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, build):
+        """Return the entry for key, calling build() and storing its result on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every in-memory entry (the on-disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,328 @@
+import io
+import os
+import posixpath
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+from redaction import redact
+
+# PyPDF2, the OCR stack and the process pool are imported inside
+# the functions that use them, so sessions that never upload that format never
+# pay for the import.
+
+SUPPORTED_TYPES = ('pdf', 'docx', 'txt', 'xml', 'png', 'jpg', 'jpeg')
+IMAGE_TYPES = ('png', 'jpg', 'jpeg')
+
+# PDFs shorter than this are extracted serially; starting spawned workers would dominate
+PARALLEL_PDF_MIN_PAGES = 100
+PDF_PAGES_PER_TASK = 8
+
+# Main document part of a DOCX, and the relationship type that names it otherwise
+DOCX_DOCUMENT = 'word/document.xml'
+OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+# Per-worker reader, built once by _init_pdf_worker so the document bytes are
+# shipped to each process a single time rather than with every page range
+_worker_reader = None
+
+
+def detect_file_type(data):
+    """Guess the report format from its leading magic bytes, or None if unrecognised"""
+    head = bytes(data[:64])
+    if head.startswith(b'%PDF-'):
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        # DOCX is the only zip container we accept
+        return 'docx'
+    if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<?xml'):
+        return 'xml'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    return None
+
+
+def _init_pdf_worker(data):
+    import PyPDF2
+
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_page_range(start, stop):
+    return [_worker_reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _pdf_page_texts(data, reader, workers, deadline):
+    page_count = len(reader.pages)
+    if workers == 1 or page_count < PARALLEL_PDF_MIN_PAGES:
+        texts = []
+        for page in reader.pages:
+            texts.append(page.extract_text() or '')
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("PDF extraction did not finish in time")
+        return texts
+
+    import multiprocessing
+
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    # Forking a threaded server (Streamlit, the job pool) can copy held locks
+    # into the workers, so they start from a fresh interpreter instead
+    pool = multiprocessing.get_context("spawn").Pool(min(workers, len(ranges)), _init_pdf_worker, (data,))
+    try:
+        pending = pool.starmap_async(_extract_page_range, ranges, chunksize=1)
+        try:
+            page_ranges = pending.get(None if deadline is None else max(deadline - time.monotonic(), 0))
+        except multiprocessing.TimeoutError:
+            raise TimeoutError("PDF extraction did not finish in time") from None
+        # Results are kept in submission order, so pages reassemble in document order
+        return [text for texts in page_ranges for text in texts]
+    finally:
+        # Also stops workers still stuck on a page after a timeout
+        pool.terminate()
+
+
+def extract_pdf_text(data, workers=None, timeout=None, use_ocr=True):
+    """Extract PDF text, sharding page ranges across a process pool for long documents
+
+    timeout limits reading the text layer, serial or pooled, in seconds.
+    Pages without a text layer (scans) are OCRed from their embedded images
+    when use_ocr is set and tesseract is installed.
+    """
+    import PyPDF2
+
+    import ocr
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    data = bytes(data)
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    texts = _pdf_page_texts(data, reader, workers or os.cpu_count() or 1, deadline)
+
+    blank_pages = [index for index, text in enumerate(texts) if not text.strip()]
+    if use_ocr and blank_pages and ocr.ocr_available():
+        images = [ocr.page_images(reader.pages[index]) for index in blank_pages]
+        for index, text in zip(blank_pages, ocr.ocr_pages(images)):
+            texts[index] = text
+    return ''.join(texts)
+
+
+def read_bytes(data, file_type=None, workers=None, timeout=None):
+    """Read a medical report held in memory (bytes, memoryview or file-like buffer)
+
+    workers and timeout only apply to PDFs; see extract_pdf_text.
+    """
+    if hasattr(data, 'read'):
+        data = data.read()
+    file_type = detect_file_type(data) or (file_type or 'txt').lower().lstrip('.')
+
+    if file_type == 'pdf':
+        return extract_pdf_text(data, workers=workers, timeout=timeout)
+
+    elif file_type == 'docx':
+        try:
+            return docx_to_text(io.BytesIO(data))
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise ValueError(f"Invalid DOCX file: {str(e)}")
+
+    elif file_type == 'txt':
+        return str(data, 'utf-8')
+
+    elif file_type in IMAGE_TYPES:
+        import ocr
+
+        if not ocr.ocr_available():
+            raise ValueError("Reading scanned images requires the tesseract OCR engine")
+        return ocr.ocr_image(data)
+
+    elif file_type == 'xml':
+        try:
+            return xml_to_text(io.BytesIO(data))
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid XML file: {str(e)}")
+
+    else:
+        raise ValueError("Unsupported file format. Use PDF, DOCX, TXT, XML, PNG or JPG")
+
+
+def read_file(file_path):
+    """Read medical report from different file formats"""
+    file_type = file_path.rsplit('.', 1)[-1].lower()
+    if file_type not in SUPPORTED_TYPES:
+        raise ValueError("Unsupported file format. Use PDF, DOCX, TXT, XML, PNG or JPG")
+    with open(file_path, 'rb') as file:
+        if file_type == 'xml':
+            # Stream straight from disk rather than loading the whole export
+            try:
+                return xml_to_text(file)
+            except ET.ParseError as e:
+                raise ValueError(f"Invalid XML file: {str(e)}")
+        return read_bytes(file.read(), file_type)
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _joined_text(element):
+    return ' '.join(piece.strip() for piece in element.itertext() if piece.strip())
+
+
+def iter_xml_text(source):
+    """Yield the readable text of an XML document in document order
+
+    The document is parsed incrementally and every element is cleared and
+    detached once handled, so memory stays flat regardless of file size.
+    For a (namespaced) CDA ClinicalDocument only section titles and narrative
+    text blocks are emitted; for any other XML every element's text is.
+    """
+    stack = []  # [element, text_emitted] pairs from the root down
+    is_cda = None
+    narrative_depth = None  # depth of the CDA section <title> or <text> being collected
+
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if is_cda is None:
+                is_cda = _local_name(element.tag) == 'ClinicalDocument'
+            elif (is_cda and narrative_depth is None and _local_name(element.tag) in ('title', 'text')
+                    and _local_name(stack[-1][0].tag) == 'section'):
+                narrative_depth = len(stack)
+            elif not is_cda and len(stack) > 1 and not stack[-1][1]:
+                # A child is starting, so the parent's leading text is complete
+                parent = stack[-1]
+                parent[1] = True
+                if parent[0].text and parent[0].text.strip():
+                    yield parent[0].text.strip()
+            stack.append([element, False])
+            continue
+
+        _, emitted = stack.pop()
+        if narrative_depth is not None and len(stack) > narrative_depth:
+            # Keep inline markup until the whole <title> or <text> is read
+            continue
+
+        if is_cda:
+            if stack and _local_name(stack[-1][0].tag) == 'section' and \
+                    _local_name(element.tag) in ('title', 'text'):
+                text = _joined_text(element)
+                if text:
+                    yield text
+            if len(stack) == narrative_depth:
+                narrative_depth = None
+        elif stack and not emitted and element.text and element.text.strip():
+            yield element.text.strip()
+
+        element.clear()
+        if stack:
+            stack[-1][0].remove(element)
+
+
+def xml_to_text(source):
+    """Convert an XML file path or file-like object to readable text"""
+    return '\n'.join(iter_xml_text(source))
+
+
+def _docx_document_part(archive):
+    """Return the name of the main document part, normally word/document.xml"""
+    names = set(archive.namelist())
+    if DOCX_DOCUMENT in names:
+        return DOCX_DOCUMENT
+    for relationship in ET.fromstring(archive.read('_rels/.rels')):
+        if relationship.get('Type') == OFFICE_DOCUMENT_REL:
+            return posixpath.normpath(relationship.get('Target').lstrip('/'))
+    raise KeyError("no main document part")
+
+
+def iter_docx_text(source):
+    """Yield the paragraphs and table rows of a DOCX in document order
+
+    The main document part is streamed out of the zip and parsed
+    incrementally; each block of the body is discarded once read, so memory
+    stays flat regardless of file size. A table row is yielded as its cell
+    texts joined by tabs, one line per row; a lab row reads
+    "Hemoglobin 11.2 g/dL 13.5-17.5" once whitespace is collapsed, which
+    LAB_PATTERN parses as a value with a bare reference range. Paragraphs
+    or tables nested in a cell become part of that cell.
+    """
+    with zipfile.ZipFile(source) as archive, archive.open(_docx_document_part(archive)) as document:
+        paragraphs = []  # text pieces of each open <w:p>, innermost last
+        cells = []  # paragraph texts of each open <w:tc>
+        rows = []  # cell texts of each open <w:tr>
+        tags = None
+        body = None
+        depth = 0
+        runs = 0  # open <w:r>; <w:tab> elsewhere is a tab stop, not text
+        fallback = 0  # open <mc:Fallback>, which repeats text already read from <mc:Choice>
+
+        for event, element in ET.iterparse(document, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                depth += 1
+                if tags is None:
+                    # Transitional and Strict OOXML use different namespaces
+                    namespace = tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+                    tags = {name: namespace + name for name in ('body', 'p', 'r', 't', 'tab', 'br', 'cr', 'tc', 'tr',
+                                                                'noBreakHyphen')}
+                if tag == tags['p']:
+                    paragraphs.append([])
+                elif tag == tags['r']:
+                    runs += 1
+                elif tag == tags['tc']:
+                    cells.append([])
+                elif tag == tags['tr']:
+                    rows.append([])
+                elif tag == MC_FALLBACK:
+                    fallback += 1
+                elif tag == tags['body']:
+                    body = element
+                continue
+
+            depth -= 1
+            if runs and not fallback and paragraphs:
+                if tag == tags['t']:
+                    paragraphs[-1].append(element.text or '')
+                elif tag == tags['tab']:
+                    paragraphs[-1].append('\t')
+                elif tag in (tags['br'], tags['cr']):
+                    paragraphs[-1].append('\n')
+                elif tag == tags['noBreakHyphen']:
+                    paragraphs[-1].append('-')
+            if tag == tags['r']:
+                runs -= 1
+            elif tag == MC_FALLBACK:
+                fallback -= 1
+            elif tag == tags['p']:
+                text = ''.join(paragraphs.pop()).strip()
+                if text:
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        yield text
+            elif tag == tags['tc']:
+                text = ' '.join(cells.pop())
+                if text and rows:
+                    rows[-1].append(text)
+            elif tag == tags['tr']:
+                text = '\t'.join(rows.pop())
+                if text:
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        yield text
+
+            if depth == 2 and body is not None:
+                # A top-level paragraph or table is done
+                body.clear()
+
+
+def docx_to_text(source):
+    """Convert a DOCX file path or file-like object to readable text"""
+    return '\n'.join(iter_docx_text(source))
+
+
+def preprocess_text(text):
+    """Clean and preprocess medical report text: collapse whitespace and redact identifiers"""
+    return redact(text)
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Request fields that do not change what the model returns
+IGNORED_FIELDS = ('stream', 'messages')
+
+
+def normalize_text(text):
+    """Reduce text to a canonical form so trivially different prompts share a key"""
+    return ' '.join(text.casefold().split()).rstrip('?!. ')
+
+
+def _normalize_content(content):
+    if isinstance(content, str):
+        return normalize_text(content)
+    parts = []
+    for part in content:
+        if part.get("type") == "text":
+            parts.append({"type": "text", "text": normalize_text(part["text"])})
+        else:
+            # Images and other parts are compared by their exact payload
+            parts.append(part)
+    return parts
+
+
+def request_key(request):
+    """Hash a chat completion request on its model, sampling parameters, system prompt and normalized content"""
+    messages = request.get("messages", [])
+    system = [m["content"] for m in messages if m["role"] == "system"]
+    conversation = [
+        {"role": m["role"], "content": _normalize_content(m["content"])}
+        for m in messages if m["role"] != "system"
+    ]
+    material = {
+        "params": {name: value for name, value in sorted(request.items()) if name not in IGNORED_FIELDS},
+        "system": hashlib.sha256(json.dumps(system, sort_keys=True).encode()).hexdigest(),
+        "content": hashlib.sha256(json.dumps(conversation, sort_keys=True).encode()).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+
+class MemoryBackend:
+    """Size-bounded in-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """SQLite store shared across processes and restarts, evicting least recently used rows"""
+
+    def __init__(self, path, max_entries=5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, value, ttl):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._connection.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """Cache of model responses keyed by request_key, with hit/miss counters"""
+
+    def __init__(self, backend=None, ttl=3600):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, request):
+        """Return the cached response for request, or None"""
+        value = self.backend.get(request_key(request))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, request, value):
+        """Store the response text for request"""
+        self.backend.put(request_key(request), value, self.ttl)
+
+    def get_or_call(self, request, call, bypass=False):
+        """Return the cached response for request, or call() and cache its result
+
+        bypass skips the lookup, for when fresh sampled (temperature > 0)
+        variety is wanted; the new response still refreshes the cache.
+        """
+        if not bypass:
+            value = self.get(request)
+            if value is not None:
+                return value
+        value = call()
+        self.put(request, value)
+        return value
+
+    def stats(self):
+        """Return the hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def cache_from_settings(settings):
+    """Build a ResponseCache from a settings mapping such as st.secrets["response_cache"]"""
+    if settings.get("BACKEND", "memory") == "sqlite":
+        backend = SQLiteBackend(settings.get("PATH", "responses.sqlite3"), settings.get("MAX_ENTRIES", 5000))
+    else:
+        backend = MemoryBackend(settings.get("MAX_ENTRIES", 256))
+    return ResponseCache(backend, ttl=settings.get("TTL_SECONDS", 3600))
@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+
+from chunking import chunk_text, section_heading, split_sections
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it my me of on or "
+    "should that the this to was what when which with you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-case word and number tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class ReportIndex:
+    """BM25 index over the chunks of one report, scored with NumPy"""
+
+    def __init__(self, chunks, headings=(), k1=1.5, b=0.75):
+        import numpy as np
+
+        self.chunks = list(chunks)
+        self.headings = list(headings)
+        self.k1 = k1
+        self.b = b
+
+        postings = {}
+        lengths = np.zeros(len(self.chunks), dtype=np.float32)
+        for doc_id, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(count)
+
+        doc_count = max(len(self.chunks), 1)
+        self._postings = {}
+        for term, (doc_ids, counts) in postings.items():
+            idf = np.log1p((doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self._postings[term] = (np.array(doc_ids, dtype=np.int32), np.array(counts, dtype=np.float32), idf)
+        # Length normalisation is query-independent, so fold it in once
+        average_length = lengths.mean() if len(self.chunks) else 1.0
+        self._norm = k1 * (1 - b + b * lengths / max(average_length, 1.0))
+
+    @classmethod
+    def from_text(cls, text, chunk_tokens=300):
+        """Build an index over a preprocessed report"""
+        headings = [heading for heading in map(section_heading, split_sections(text)) if heading]
+        return cls(chunk_text(text, chunk_tokens), headings=dict.fromkeys(headings))
+
+    def scores(self, query):
+        """Return the BM25 score of every chunk for query"""
+        import numpy as np
+
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self._postings:
+                doc_ids, counts, idf = self._postings[term]
+                scores[doc_ids] += idf * counts * (self.k1 + 1) / (counts + self._norm[doc_ids])
+        return scores
+
+    def search(self, query, k=4):
+        """Return the k most relevant chunks in document order
+
+        Queries that match nothing (e.g. "summarize my report") fall back to
+        the opening chunks.
+        """
+        import numpy as np
+
+        if len(self.chunks) <= k:
+            return list(self.chunks)
+        scores = self.scores(query)
+        if not scores.any():
+            return self.chunks[:k]
+        top = np.argpartition(-scores, k)[:k]
+        return [self.chunks[doc_id] for doc_id in sorted(top) if scores[doc_id] > 0]
+
+    def context(self, query, k=4):
+        """Format the section outline and the top-k passages for a chat prompt"""
+        outline = "Report sections: " + ", ".join(self.headings) + "\n\n" if self.headings else ""
+        passages = "\n\n".join(f"[Excerpt] {chunk}" for chunk in self.search(query, k))
+        return f"{outline}Relevant excerpts from the report:\n\n{passages}"
@@ -0,0 +1,23 @@
+import time
+
+CURSOR = "▌"
+
+
+def render_stream(deltas, placeholder, interval_ms=100):
+    """Render text deltas progressively into a placeholder and return the full text
+
+    Deltas are buffered in a list and the placeholder is repainted at most
+    once per interval_ms, rather than once per token, with a final repaint
+    once the stream ends.
+    """
+    parts = []
+    last_paint = 0.0
+    for delta in deltas:
+        parts.append(delta)
+        now = time.monotonic()
+        if (now - last_paint) * 1000 >= interval_ms:
+            placeholder.markdown(''.join(parts) + CURSOR)
+            last_paint = now
+    text = ''.join(parts)
+    placeholder.markdown(text)
+    return text
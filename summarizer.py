@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from chunking import chunk_text, estimate_tokens
+from rate_limit import TokenBucket
+
+MAP_PROMPT = (
+    "This is part {index} of {total} of a medical report. Summarize the clinically relevant "
+    "content of this part only: diagnoses, abnormal or critical values (with units and "
+    "reference ranges), medications, procedures and recommendations. Keep section names.\n\n{chunk}"
+)
+
+REDUCE_PROMPT = (
+    "Please analyze this medical report and provide a comprehensive summary. The report was "
+    "too long to send at once, so below are summaries of its parts, in order:\n\n{summaries}"
+)
+
+
+def map_summaries(text, complete, chunk_tokens=3000, summary_tokens=400,
+                  max_in_flight=4, tokens_per_minute=None):
+    """Summarize each chunk of text concurrently, returning the summaries in document order
+
+    complete(prompt, max_tokens) performs one model call and returns its text.
+    At most max_in_flight calls run at once, and when tokens_per_minute is set
+    each call first reserves its prompt and completion tokens from a shared bucket.
+    """
+    chunks = chunk_text(text, chunk_tokens)
+    bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def summarize(indexed_chunk):
+        index, chunk = indexed_chunk
+        prompt = MAP_PROMPT.format(index=index, total=len(chunks), chunk=chunk)
+        if bucket:
+            bucket.acquire(estimate_tokens(prompt) + summary_tokens)
+        return complete(prompt, summary_tokens)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        return list(executor.map(summarize, enumerate(chunks, start=1)))
+
+
+def _join_summaries(summaries):
+    return '\n\n'.join(f"Part {index}: {summary}" for index, summary in enumerate(summaries, start=1))
+
+
+def build_reduce_prompt(text, complete, chunk_tokens=3000, **map_options):
+    """Map text to part summaries and return the reduce prompt that merges them"""
+    summaries = map_summaries(text, complete, chunk_tokens, **map_options)
+    joined = _join_summaries(summaries)
+    # Summaries of a very long report can themselves overflow the budget; fold them again
+    while estimate_tokens(joined) > chunk_tokens:
+        folded = map_summaries(joined, complete, chunk_tokens, **map_options)
+        if len(folded) >= len(summaries):
+            break
+        summaries, joined = folded, _join_summaries(folded)
+    return REDUCE_PROMPT.format(summaries=joined)
@@ -0,0 +1,256 @@
+import contextvars
+import json
+import math
+import threading
+import time
+from collections import deque
+
+METRIC_PREFIX = "healthinsight"
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Numeric span attributes that are totalled per stage
+COUNTED_ATTRIBUTES = ("bytes_in", "bytes_out", "tokens_in", "tokens_out", "retries", "hedges")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, q in [0, 100]; None when there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class Span:
+    """One timed pipeline stage with its attributes (bytes, tokens, cache hit, ...)
+
+    Use as a context manager; an exception leaving the block is recorded as
+    the span's error and re-raised.
+    """
+
+    __slots__ = ('name', 'parent', 'attributes', 'started', 'duration', 'error', '_telemetry', '_token')
+
+    def __init__(self, telemetry, name, attributes):
+        self._telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        parent = _current_span.get()
+        self.parent = parent.name if parent is not None else None
+        self.started = None
+        self.duration = None
+        self.error = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.duration = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        if error is not None:
+            self.fail(error)
+        self._telemetry.record(self)
+        return False
+
+    def set(self, **attributes):
+        """Add or replace attributes"""
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Record an error that the caller handles itself (e.g. by returning a message)"""
+        self.error = type(error).__name__
+        self.attributes["error_message"] = str(error)[:500]
+
+    def watch(self, deltas):
+        """Pass a stream of text deltas through, recording time to first token and characters out"""
+        chars = 0
+        for delta in deltas:
+            if "ttft_s" not in self.attributes:
+                self.attributes["ttft_s"] = time.perf_counter() - self.started
+            chars += len(delta)
+            yield delta
+        self.attributes["chars_out"] = chars
+
+    def as_dict(self):
+        return {
+            "ts": time.time(),
+            "stage": self.name,
+            "parent": self.parent,
+            "duration_ms": round(self.duration * 1000, 3),
+            "error": self.error,
+            **self.attributes,
+        }
+
+
+class _StageStats:
+    __slots__ = ('count', 'errors', 'buckets', 'total', 'ttft_buckets', 'ttft_total', 'ttft_count',
+                 'totals', 'cache_hits', 'cache_misses', 'durations', 'ttfts')
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.ttft_buckets = [0] * len(LATENCY_BUCKETS)
+        self.ttft_total = 0.0
+        self.ttft_count = 0
+        self.totals = dict.fromkeys(COUNTED_ATTRIBUTES, 0)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Recent samples for live percentiles; the histograms keep the full history
+        self.durations = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+
+
+def _observe(buckets, value):
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if value <= bound:
+            buckets[index] += 1
+
+
+class Telemetry:
+    """Collects spans into per-stage counters, histograms and recent-sample windows
+
+    Exports Prometheus text format (prometheus(), or serve() for scraping)
+    and, with log_path, appends every span as a JSON line.
+    """
+
+    def __init__(self, window=1000, log_path=None):
+        self.window = window
+        self.log_path = log_path
+        self._stages = {}
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a', encoding='utf-8') if log_path else None
+
+    def span(self, name, **attributes):
+        """Return a Span for a stage; attributes may be added later with span.set"""
+        return Span(self, name, attributes)
+
+    def record(self, span):
+        """Fold a finished span into the stage statistics and the JSON log"""
+        entry = span.as_dict()
+        with self._lock:
+            stats = self._stages.get(span.name)
+            if stats is None:
+                stats = self._stages[span.name] = _StageStats(self.window)
+            stats.count += 1
+            stats.total += span.duration
+            stats.durations.append(span.duration)
+            _observe(stats.buckets, span.duration)
+            if span.error:
+                stats.errors[span.error] = stats.errors.get(span.error, 0) + 1
+            ttft = span.attributes.get("ttft_s")
+            if ttft is not None:
+                stats.ttft_count += 1
+                stats.ttft_total += ttft
+                stats.ttfts.append(ttft)
+                _observe(stats.ttft_buckets, ttft)
+            for name in COUNTED_ATTRIBUTES:
+                stats.totals[name] += span.attributes.get(name) or 0
+            cache_hit = span.attributes.get("cache_hit")
+            if cache_hit is not None:
+                if cache_hit:
+                    stats.cache_hits += 1
+                else:
+                    stats.cache_misses += 1
+            self._recent.append(entry)
+            if self._log is not None:
+                self._log.write(json.dumps(entry, default=str) + "\n")
+                self._log.flush()
+
+    def summary(self):
+        """One row per stage with counts, error and cache-hit totals and recent p50/p95/p99, for display"""
+        with self._lock:
+            stages = [(name, stats, list(stats.durations), list(stats.ttfts)) for name, stats in self._stages.items()]
+        rows = []
+        for name, stats, durations, ttfts in sorted(stages, key=lambda stage: stage[0]):
+            row = {"stage": name, "count": stats.count, "errors": sum(stats.errors.values())}
+            for q in (50, 95, 99):
+                row[f"p{q}_ms"] = round(percentile(durations, q) * 1000, 1)
+            for q in (50, 95):
+                value = percentile(ttfts, q)
+                row[f"ttft_p{q}_ms"] = round(value * 1000, 1) if value is not None else None
+            lookups = stats.cache_hits + stats.cache_misses
+            row["cache_hit_rate"] = round(stats.cache_hits / lookups, 3) if lookups else None
+            row.update(stats.totals)
+            rows.append(row)
+        return rows
+
+    def recent(self, count=50):
+        """The most recent spans as dicts, newest first"""
+        with self._lock:
+            return list(self._recent)[-count:][::-1]
+
+    def prometheus(self):
+        """Render every stage's metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+
+        def histogram(name, stage, buckets, total, count):
+            for bound, value in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'{METRIC_PREFIX}_{name}_bucket{{stage="{stage}",le="{bound}"}} {value}')
+            lines.append(f'{METRIC_PREFIX}_{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{METRIC_PREFIX}_{name}_count{{stage="{stage}"}} {count}')
+
+        with self._lock:
+            stages = sorted(self._stages.items())
+            metric("stage_duration_seconds", "histogram", "Time spent in each pipeline stage")
+            for stage, stats in stages:
+                histogram("stage_duration_seconds", stage, stats.buckets, stats.total, stats.count)
+            metric("time_to_first_token_seconds", "histogram", "Time from request to first streamed token")
+            for stage, stats in stages:
+                if stats.ttft_count:
+                    histogram("time_to_first_token_seconds", stage, stats.ttft_buckets, stats.ttft_total,
+                              stats.ttft_count)
+            metric("stage_errors_total", "counter", "Stage failures by exception type")
+            for stage, stats in stages:
+                for error, count in sorted(stats.errors.items()):
+                    lines.append(f'{METRIC_PREFIX}_stage_errors_total{{stage="{stage}",error="{error}"}} {count}')
+            for attribute in COUNTED_ATTRIBUTES:
+                metric(f"{attribute}_total", "counter", f"Total {attribute.replace('_', ' ')} per stage")
+                for stage, stats in stages:
+                    lines.append(f'{METRIC_PREFIX}_{attribute}_total{{stage="{stage}"}} {stats.totals[attribute]}')
+            metric("cache_lookups_total", "counter", "Cache lookups per stage by result")
+            for stage, stats in stages:
+                if stats.cache_hits or stats.cache_misses:
+                    lines.append(f'{METRIC_PREFIX}_cache_lookups_total{{stage="{stage}",result="hit"}} {stats.cache_hits}')
+                    lines.append(f'{METRIC_PREFIX}_cache_lookups_total{{stage="{stage}",result="miss"}} {stats.cache_misses}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve prometheus() at /metrics from a background thread; returns the server
+
+        Listens on localhost only unless another host (e.g. "0.0.0.0") is given.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = telemetry.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
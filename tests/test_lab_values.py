@@ -0,0 +1,60 @@
+from lab_values import LabTable
+
+REPORT = (
+    "Labs today show Hemoglobin 11.2 g/dL (13.5-17.5) and WBC: 12.4 x10^9/L [4.0 - 11.0].\n"
+    "Potassium 5.6 mmol/L (3.5-5.1)\n"
+    "LDL 162 mg/dL (ref <100)\n"
+    "Result Alkaline phosphatase 90 U/L (40-129)\n"
+)
+
+
+def test_extracts_values_units_and_ranges():
+    table = LabTable.from_text(REPORT)
+    assert table.analytes == ["Hemoglobin", "WBC", "Potassium", "LDL", "Alkaline phosphatase"]
+    assert table.units[:3] == ["g/dL", "x10^9/L", "mmol/L"]
+    assert [table.reference(row_id) for row_id in range(len(table))] == [
+        "13.5-17.5", "4-11", "3.5-5.1", "<100", "40-129"]
+    assert [record["flag"] for record in table.records()] == ["low", "high", "high", "high", ""]
+
+
+def test_trims_sentence_words_before_the_analyte():
+    table = LabTable.from_text("The repeat labs showed Sodium 131 mmol/L (135-145).")
+    assert table.analytes == ["Sodium"]
+
+
+def test_skips_unknown_analytes_without_a_range():
+    assert len(LabTable.from_text("Seen in Room 12 on Ward 4.")) == 0
+
+
+def test_matches_names_and_aliases():
+    table = LabTable.from_text(REPORT)
+    assert list(table.find("Is my white blood cell count high?")) == [1]
+    assert list(table.find("what about my haemoglobin")) == [0]
+    assert list(table.find("Is my potassium okay?")) == [2]
+
+
+def test_short_aliases_do_not_match_ordinary_words():
+    table = LabTable.from_text("K 5.6 mmol/L (3.5-5.1)\nNa 131 mmol/L (135-145)")
+    assert table.analytes == ["K", "Na"]
+    assert list(table.find("Should I take vitamin K?")) == []
+    assert list(table.find("Is my potassium high?")) == [0]
+    assert table.answer("Is my sodium low?").startswith("From the lab results")
+
+
+def test_answers_status_questions_locally():
+    answer = LabTable.from_text(REPORT).answer("Is my potassium high?")
+    assert "Potassium: 5.6 mmol/L, above the reference range (3.5-5.1 mmol/L)." in answer
+
+
+def test_defers_when_a_named_analyte_is_missing():
+    table = LabTable.from_text(REPORT)
+    assert table.answer("Is my hemoglobin A1c high?") is None
+    assert table.answer("Are my potassium and creatinine high?") is None
+    assert table.answer("What does my potassium mean?") is None
+
+
+def test_reads_bare_ranges_from_table_rows_only():
+    table = LabTable.from_text("Ferritin 8 ng/mL 15-150 Sodium 140 mmol/L 135-145 Aspirin 81 mg 1-2 tablets "
+                               "Visit 12 on 2024-01-02")
+    assert table.analytes == ["Ferritin", "Sodium"]
+    assert [record["flag"] for record in table.records()] == ["low", ""]
@@ -0,0 +1,50 @@
+import json
+import os
+import random
+
+import pytest
+
+from redaction import Redactor
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "benchmarks", "redaction_corpus.jsonl")
+
+with open(CORPUS, encoding='utf-8') as corpus:
+    CASES = [json.loads(line) for line in corpus if line.strip()]
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: case["text"][:30])
+def test_corpus(case):
+    assert Redactor().redact(case["text"]) == case["expected"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunked_output_matches_whole_text(seed):
+    rng = random.Random(seed)
+    for case in CASES:
+        text = case["text"]
+        redactor = Redactor()
+        # A small overlap forces cuts inside these short texts
+        redactor.overlap = 32
+        size = rng.randint(1, 16)
+        chunks = [text[start:start + size] for start in range(0, len(text), size)]
+        assert ''.join(redactor.redact_chunks(chunks)) == Redactor().redact(text), (text, size)
+
+
+def test_labelled_name_is_learned_for_the_rest_of_the_document():
+    text = "Patient: Omar Haddad\nHADDAD was admitted; Omar Haddad and Mr. Haddad consented. Omar called."
+    assert Redactor().redact(text) == "[REDACTED] [REDACTED] was admitted; [REDACTED] and [REDACTED] consented. Omar called."
+
+
+def test_lab_word_surname_is_redacted_but_not_learned():
+    assert Redactor().redact("Patient: John White\nWhite Blood Cell Count 9") == "[REDACTED] White Blood Cell Count 9"
+
+
+def test_first_word_is_redacted_when_the_rest_is_not_a_name():
+    assert Redactor().redact("Name: Anna Glucose 5.6 mmol/L") == "[REDACTED] Glucose 5.6 mmol/L"
+    assert Redactor().redact("Name: Hemoglobin A1C 7.2%") == "Name: Hemoglobin A1C 7.2%"
+
+
+def test_known_names_are_redacted_without_a_label():
+    assert Redactor(names=["Priya Raman"]).redact("Seen with Priya Raman; RAMAN agreed.") == \
+        "Seen with [REDACTED]; [REDACTED] agreed."
@@ -0,0 +1,62 @@
+import io
+import zipfile
+
+import pytest
+
+from benchmarks.synthetic import make_pdf
+from lab_values import LabTable
+from report_parser import extract_pdf_text, preprocess_text, read_bytes
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+
+def paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+
+def make_docx(body):
+    document = f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>'
+    buffered = io.BytesIO()
+    with zipfile.ZipFile(buffered, 'w') as archive:
+        archive.writestr('word/document.xml', document)
+    return buffered.getvalue()
+
+
+def table(*rows):
+    return '<w:tbl>' + ''.join(
+        '<w:tr>' + ''.join(f'<w:tc>{paragraph(cell)}</w:tc>' for cell in row) + '</w:tr>' for row in rows
+    ) + '</w:tbl>'
+
+
+def test_docx_lab_table_rows_keep_their_reference_ranges():
+    data = make_docx(paragraph('LABORATORY RESULTS') + table(
+        ('Test', 'Result', 'Reference range'),
+        ('Hemoglobin', '11.2 g/dL', '13.5-17.5'),
+        ('Sodium', '140 mmol/L', '135 - 145'),
+        ('Ferritin', '8 ng/mL', '15-150'),
+    ) + paragraph('Take 1-2 tablets daily.'))
+    lab_table = LabTable.from_text(preprocess_text(read_bytes(data, 'docx')))
+    assert lab_table.analytes == ['Hemoglobin', 'Sodium', 'Ferritin']
+    assert [lab_table.reference(row_id) for row_id in range(len(lab_table))] == ['13.5-17.5', '135-145', '15-150']
+    assert [record['flag'] for record in lab_table.records()] == ['low', '', 'low']
+
+
+def test_docx_table_rows_are_tab_separated_lines():
+    data = make_docx(table(('Potassium', '5.6 mmol/L', '3.5-5.1')) + paragraph('Follow up in 2 weeks.'))
+    assert read_bytes(data, 'docx') == 'Potassium\t5.6 mmol/L\t3.5-5.1\nFollow up in 2 weeks.'
+
+
+def test_pdf_timeout_applies_to_serial_extraction():
+    with pytest.raises(TimeoutError):
+        extract_pdf_text(make_pdf(5), workers=1, timeout=0.0001)
+    assert "Hemoglobin" in extract_pdf_text(make_pdf(5), workers=1, timeout=60)
+
+
+def test_ccd_titles_and_narrative_keep_inline_markup():
+    document = (
+        '<?xml version="1.0"?><ClinicalDocument xmlns="urn:hl7-org:v3"><component><structuredBody>'
+        '<component><section><title>Lab <b>Results</b></title>'
+        '<text><paragraph>Potassium <content>5.6 mmol/L</content> (3.5-5.1)</paragraph></text></section></component>'
+        '</structuredBody></component></ClinicalDocument>'
+    )
+    assert read_bytes(document.encode(), 'xml') == 'Lab Results\nPotassium 5.6 mmol/L (3.5-5.1)'